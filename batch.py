@@ -0,0 +1,177 @@
+"""
+Headless location studies: normalisation, model and metrics for a list of countries and numbers
+of warehouses, spread over a process pool, without Streamlit.
+
+    python batch.py --iso3 ITA FRA --k 5 10 15 --model Pulp --params '{"formulation": "sparse"}' --out results
+    python batch.py --iso3 all --k 10 --format csv
+    python batch.py --iso3 USA IND --k 20 --model Pulp --reduce 2000
+"""
+import argparse
+import inspect
+import json
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from data_exploration import loader, normal
+from metrics.clusters import cluster_metrics
+from models.reduction import REDUCTION_METHODS, solve_reduced
+from models.registry import MODELS_TYPES
+
+# Default output directory and file format of a study
+OUTPUT_DIR = 'results'
+FORMATS = ('parquet', 'csv')
+
+# Stages timed for every run
+STAGES = ('load', 'normalise', 'model', 'metrics', 'write')
+
+
+def run_study(iso3_codes, k_values, model='K-Means', params=None, seed=normal.DEFAULT_SEED,
+              demand_model='population', output_dir=OUTPUT_DIR, fmt='parquet', max_workers=None, reduction=None):
+    """
+    Runs every (country, number of warehouses) pair of a study on a process pool and writes the
+    labels, centroids and cluster table of every run.
+    Parameters:
+        iso3_codes (list): Country codes, or 'all' for every country of the store.
+        k_values (list): Numbers of warehouses.
+        model (str): Key of `MODELS_TYPES`.
+        params (dict): Extra keyword arguments of the model.
+        seed (int): Seed of the demand noise.
+        demand_model (str): Key of `normal.DEMAND_MODELS`.
+        output_dir (str): Directory of the results, one sub-directory per country and number of warehouses.
+        fmt (str): 'parquet' or 'csv'.
+        max_workers (int): Size of the process pool, the number of CPUs by default.
+        reduction (dict): Keyword arguments of `models.reduction.solve_reduced` to solve on
+            demand-weighted super-points, None to solve every customer.
+    Returns:
+        DataFrame: One row per run with its status, figures and per-stage timings in seconds,
+        also written to the output directory as the study summary.
+    """
+    if model not in MODELS_TYPES:
+        raise ValueError(f"Unknown model '{model}', expected one of {list(MODELS_TYPES)}")
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown format '{fmt}', expected one of {FORMATS}")
+
+    # Build the store once here, so the workers only read it
+    loader.build_store()
+    if iso3_codes == 'all' or list(iso3_codes) == ['all']:
+        iso3_codes = loader.iso3_codes()
+    tasks = [(iso3.upper(), int(k)) for iso3 in iso3_codes for k in k_values]
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(run_task, iso3, k, model, params or {}, seed, demand_model, output_dir, fmt,
+                                   reduction)
+                   for iso3, k in tasks]
+        rows = [future.result() for future in futures]
+
+    summary = pd.DataFrame(rows)
+    os.makedirs(output_dir, exist_ok=True)
+    write_table(summary, os.path.join(output_dir, 'summary'), fmt)
+    print(f"{len(tasks)} runs, {int((summary['status'] == 'done').sum())} done, "
+          f"in {time.perf_counter() - start:.1f} s")
+    return summary
+
+
+def run_task(iso3, num_clusters, model, params, seed, demand_model, output_dir, fmt, reduction=None):
+    """
+    One run of a study, executed in a worker. Failures are reported in the row instead of raised,
+    so one country cannot stop the study.
+    Returns:
+        dict: Summary row of the run.
+    """
+    row = {'iso3': iso3, 'warehouses': num_clusters, 'model': model, 'status': 'done', 'error': None}
+    timings = dict.fromkeys(STAGES, 0.0)
+    try:
+        stage = time.perf_counter()
+        df = loader.load_country(iso3)
+        timings['load'] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        df = normal.normal_data(df, seed=seed, demand_model=demand_model)
+        timings['normalise'] = time.perf_counter() - stage
+        row['customers'] = len(df)
+        if len(df) < num_clusters:
+            raise ValueError(f"{len(df)} customers for {num_clusters} warehouses")
+
+        stage = time.perf_counter()
+        model_function = MODELS_TYPES[model]
+        report = {} if 'report' in inspect.signature(model_function).parameters else None
+        model_params = dict(params, report=report) if report is not None else params
+        if reduction is None:
+            df, labels, centroids = model_function(df, num_clusters, **model_params)
+        else:
+            reduction_report = {}
+            df, labels, centroids = solve_reduced(model_function, df, num_clusters, model_params,
+                                                  report=reduction_report, **reduction)
+            row.update(super_points=reduction_report['super_points'], cost_change=reduction_report['cost_change'])
+            report = dict(report or {}, reduction=reduction_report)
+        timings['model'] = time.perf_counter() - stage
+
+        stage = time.perf_counter()
+        metrics = cluster_metrics(df, labels, centroids)
+        timings['metrics'] = time.perf_counter() - stage
+        row.update({
+            'opened': len(centroids),
+            'weighted_distance': float(np.nansum(metrics.demand * metrics.weighted_distance) / metrics.demand.sum()),
+            'max_utilisation': float(np.max(metrics.utilisation)),
+        })
+
+        stage = time.perf_counter()
+        run_dir = os.path.join(output_dir, iso3, f'k{num_clusters}')
+        os.makedirs(run_dir, exist_ok=True)
+        write_table(df[['city', 'lat', 'lng', 'Demand']].assign(Cluster=np.asarray(labels)),
+                    os.path.join(run_dir, 'labels'), fmt)
+        write_table(pd.DataFrame(np.asarray(centroids)[:, :2], columns=['lat', 'lng']).rename_axis('Cluster').reset_index(),
+                    os.path.join(run_dir, 'centroids'), fmt)
+        write_table(metrics.table(), os.path.join(run_dir, 'cluster_table'), fmt)
+        if report:
+            with open(os.path.join(run_dir, 'report.json'), 'w') as file:
+                json.dump(report, file, indent=2, default=str)
+        timings['write'] = time.perf_counter() - stage
+    except Exception as error:
+        row.update(status='failed', error=f"{type(error).__name__}: {error}")
+        row['traceback'] = traceback.format_exc()
+
+    row.update({f'{stage}_time': seconds for stage, seconds in timings.items()})
+    row['total_time'] = sum(timings.values())
+    return row
+
+
+def write_table(df, path, fmt):
+    """
+    Writes a DataFrame to `path` with the extension of the format.
+    """
+    if fmt == 'parquet':
+        df.to_parquet(f'{path}.parquet', index=False)
+    else:
+        df.to_csv(f'{path}.csv', index=False)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run warehouse location studies without the app.")
+    parser.add_argument('--iso3', nargs='+', required=True, help="Country codes, or 'all'")
+    parser.add_argument('--k', nargs='+', type=int, required=True, help="Numbers of warehouses")
+    parser.add_argument('--model', default='K-Means', choices=list(MODELS_TYPES))
+    parser.add_argument('--params', type=json.loads, default={}, help="Model keyword arguments as JSON")
+    parser.add_argument('--seed', type=int, default=normal.DEFAULT_SEED)
+    parser.add_argument('--demand-model', default='population', choices=list(normal.DEMAND_MODELS))
+    parser.add_argument('--out', default=OUTPUT_DIR)
+    parser.add_argument('--format', default='parquet', choices=FORMATS)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--reduce', type=int, default=None, metavar='POINTS',
+                        help="Solve on at most this many demand-weighted super-points")
+    parser.add_argument('--reduce-method', default='grid', choices=list(REDUCTION_METHODS))
+    args = parser.parse_args(argv)
+
+    reduction = {'max_points': args.reduce, 'method': args.reduce_method} if args.reduce else None
+    summary = run_study(args.iso3, args.k, args.model, args.params, args.seed, args.demand_model,
+                        args.out, args.format, args.workers, reduction)
+    columns = ['iso3', 'warehouses', 'status', 'customers', 'max_utilisation', 'total_time', 'error']
+    print(summary[[column for column in columns if column in summary]].to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
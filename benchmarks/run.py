@@ -0,0 +1,201 @@
+"""
+Benchmarks of the data -> model -> metrics -> render pipeline, on synthetic datasets and real
+country slices. Every case records its best wall time and its peak traced memory, compared with a
+JSON baseline to flag regressions.
+
+    python -m benchmarks.run                  # compare with the baseline, saved on the first run
+    python -m benchmarks.run --save           # record a new baseline
+    python -m benchmarks.run --sizes 1000 --iso3 ITA --cases normal_data kmeans
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+import numpy as np
+import pandas as pd
+from data_exploration import loader, normal
+from metrics import capacity
+from models import capacitated, kmeans, pulp_model
+from plots import folium_density, folium_plot, plot_clusters_consumers
+from visualizations import folium_extra
+
+BASELINE_PATH = os.path.join('benchmarks', 'baseline.json')
+
+# Default datasets: synthetic customer counts and real countries
+SIZES = (1000, 10000, 100000)
+ISO3_CODES = ('ITA', 'USA', 'IND')
+
+# Number of warehouses of the model cases
+NUM_CLUSTERS = 10
+
+# The MILP is only benchmarked up to this number of customers
+PULP_MAX_POINTS = 5000
+PULP_PARAMS = {'formulation': 'sparse', 'candidate_factor': 2, 'solver_config': {'time_limit': 30, 'gap': 0.01}}
+
+# Timed runs per case, the best one is kept, and fewer for the large datasets
+REPEAT = 3
+LARGE_DATASET = 50000
+
+# A case regresses when it is slower or bigger than the baseline by the tolerance and the margin
+TIME_TOLERANCE = 0.25
+TIME_MARGIN = 0.05
+MEMORY_TOLERANCE = 0.2
+MEMORY_MARGIN_MB = 1.0
+
+
+def synthetic_cities(n, seed=0):
+    """
+    Raw cities shaped like the world cities sheet: population clusters around a few centres, with
+    a heavy-tailed population above the normalisation threshold.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.uniform([36, 6], [47, 18], size=(20, 2))
+    points = centres[rng.integers(0, len(centres), n)] + rng.normal(0, 0.8, size=(n, 2))
+    return pd.DataFrame({
+        'city': [f'city{i}' for i in range(n)],
+        'lat': points[:, 0],
+        'lng': points[:, 1],
+        'population': normal.MIN_POPULATION * np.exp(rng.exponential(1.0, n)),
+        'admin_name': 'synthetic',
+    })
+
+
+def datasets(sizes, iso3_codes):
+    """
+    Returns:
+        dict: Raw cities of every dataset by name.
+    """
+    raw = {f'synthetic-{n // 1000}k': synthetic_cities(n) for n in sizes}
+    raw.update({iso3: loader.load_country(iso3) for iso3 in iso3_codes})
+    return raw
+
+
+def measure(function, repeat):
+    """
+    Best wall time over `repeat` runs, then one traced run for the peak memory, as tracing slows
+    the code down.
+    Returns:
+        tuple: Result of the fastest run, wall time in seconds and peak memory in MB.
+    """
+    wall = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = function()
+        if time.perf_counter() - start < wall:
+            wall, result = time.perf_counter() - start, output
+    tracemalloc.start()
+    try:
+        function()
+        peak = tracemalloc.get_traced_memory()[1] / 2**20
+    finally:
+        tracemalloc.stop()
+    return result, wall, peak
+
+
+def pulp_run(df):
+    report = {}
+    result = pulp_model.process_data(df.copy(), NUM_CLUSTERS, report=report, **PULP_PARAMS)
+    return result, report
+
+
+def dataset_cases(raw):
+    """
+    Benchmark cases of one dataset, in pipeline order, each a function of the previous outputs.
+    """
+    cases = {}
+    cases['normal_data'] = lambda state: normal.normal_data(raw)
+    cases['kmeans'] = lambda state: kmeans.get_kmeans(state['normal_data'].copy(), NUM_CLUSTERS)
+    cases['capacitated'] = lambda state: capacitated.get_capacitated(state['normal_data'].copy(), NUM_CLUSTERS)
+    cases['pulp'] = lambda state: pulp_run(state['normal_data'])
+    cases['capacity'] = lambda state: capacity.capcacity_display(*state['kmeans'][::2])
+    cases['demand_deck'] = lambda state: folium_plot.pydeck_plot_data(state['normal_data']).to_json()
+    cases['density_deck'] = lambda state: folium_density.pydeck_density_data(state['normal_data']).to_json()
+    cases['cluster_deck'] = lambda state: plot_clusters_consumers.cluster_map_deck(
+        state['kmeans'][0], state['kmeans'][1], state['kmeans'][2]).to_json()
+    cases['centroid_map'] = lambda state: folium_extra.folium_extra_html(
+        raw['lat'].mean(), raw['lng'].mean(), state['kmeans'][2], state['capacity'][0]['Total Demand per Cluster in Units'].to_numpy())
+    return cases
+
+
+def run_benchmarks(sizes=SIZES, iso3_codes=ISO3_CODES, only=None):
+    """
+    Runs every case on every dataset.
+    Parameters:
+        sizes (iterable): Synthetic dataset sizes.
+        iso3_codes (iterable): Countries of the store.
+        only (list): Names of the cases to run, with the cases they depend on, all when None.
+    Returns:
+        dict: Wall time, peak memory and stage timings by 'dataset/case'.
+    """
+    results = {}
+    for name, raw in datasets(sizes, iso3_codes).items():
+        state = {}
+        repeat = 1 if len(raw) >= LARGE_DATASET else REPEAT
+        for case, function in dataset_cases(raw).items():
+            if case == 'pulp' and len(raw) > PULP_MAX_POINTS:
+                continue
+            if only and case not in only and case not in ('normal_data', 'kmeans', 'capacity'):
+                continue
+            result, wall, peak = measure(lambda: function(state), 1 if case == 'pulp' else repeat)
+            entry = {'wall': wall, 'peak_mb': peak}
+            if case == 'pulp':
+                result, report = result
+                entry['stages'] = {stage: report[f'{stage}_time'] for stage in ('distance', 'build', 'load', 'solve', 'repair')}
+            state[case] = result
+            if not only or case in only:
+                results[f'{name}/{case}'] = entry
+                print(f"{name:>16} {case:<14} {wall:9.3f} s {peak:9.1f} MB", flush=True)
+    return results
+
+
+def compare(results, baseline):
+    """
+    Returns:
+        list: Description of every case slower or bigger than its baseline.
+    """
+    regressions = []
+    for key, entry in results.items():
+        base = baseline.get(key)
+        if base is None:
+            continue
+        if entry['wall'] > base['wall'] * (1 + TIME_TOLERANCE) and entry['wall'] - base['wall'] > TIME_MARGIN:
+            regressions.append(f"{key}: wall {base['wall']:.3f} s -> {entry['wall']:.3f} s")
+        if entry['peak_mb'] > base['peak_mb'] * (1 + MEMORY_TOLERANCE) and \
+                entry['peak_mb'] - base['peak_mb'] > MEMORY_MARGIN_MB:
+            regressions.append(f"{key}: peak {base['peak_mb']:.1f} MB -> {entry['peak_mb']:.1f} MB")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the data, model, metrics and render pipeline.")
+    parser.add_argument('--sizes', nargs='*', type=int, default=list(SIZES))
+    parser.add_argument('--iso3', nargs='*', default=list(ISO3_CODES))
+    parser.add_argument('--cases', nargs='*', default=None, help="Cases to report, all by default")
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save', action='store_true', help="Record the results as the new baseline")
+    args = parser.parse_args(argv)
+
+    results = run_benchmarks(args.sizes, args.iso3, args.cases)
+    document = {'created': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+                'machine': platform.platform(), 'results': results}
+
+    if args.save or not os.path.exists(args.baseline):
+        with open(args.baseline, 'w') as file:
+            json.dump(document, file, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    with open(args.baseline) as file:
+        baseline = json.load(file)['results']
+    regressions = compare(results, baseline)
+    for regression in regressions:
+        print(f"REGRESSION {regression}")
+    print(f"{len(regressions)} regressions against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
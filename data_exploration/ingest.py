@@ -0,0 +1,226 @@
+"""
+Ingestion of customer files into the columnar store: the file is streamed in chunks, its columns
+are matched and typed, invalid rows are rejected and delivery points sharing coordinates are merged
+into one customer, so memory follows the number of distinct locations rather than the file size.
+Streamlit holds a whole upload in memory, so files above its 200 MB upload limit go through the
+command line:
+
+    python -m data_exploration.ingest deliveries.csv --name acme
+"""
+import argparse
+import os
+import re
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+from data_exploration import loader
+from profiling.trace import count, span
+
+# Rows read at a time, and rows of partial aggregates kept before they are merged together
+CHUNK_SIZE = 200000
+MERGE_ROWS = 2000000
+
+# Coordinates are rounded to this many decimals before duplicates are merged, about a metre
+COORDINATE_DECIMALS = 5
+
+# Accepted file column names of every store column, matched case-insensitively
+COLUMN_ALIASES = {
+    'lat': ('lat', 'latitude', 'y'),
+    'lng': ('lng', 'lon', 'long', 'longitude', 'x'),
+    'Demand': ('demand', 'quantity', 'volume', 'units'),
+    'population': ('population',),
+    'city': ('city', 'name', 'customer', 'customer_id', 'id'),
+    'admin_name': ('admin_name', 'region', 'state', 'province'),
+}
+REQUIRED_COLUMNS = ('lat', 'lng')
+
+# Names of the datasets in the store
+NAME_PATTERN = re.compile(r'^[A-Za-z0-9_-]+$')
+
+
+def dataset_name(filename):
+    """
+    Store name derived from a file name, e.g. 'Customers 2024.csv' -> 'Customers_2024'.
+    """
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', stem).strip('_') or 'dataset'
+
+
+def resolve_columns(names, columns=None):
+    """
+    Matches the columns of a file to the store columns.
+    Parameters:
+        names (list): Column names of the file.
+        columns (dict): Explicit store column -> file column mapping, overriding `COLUMN_ALIASES`.
+    Returns:
+        dict: Store column -> file column, for the columns found.
+    """
+    lookup = {str(name).strip().lower(): name for name in names}
+    mapping = {}
+    for column, aliases in COLUMN_ALIASES.items():
+        if columns and column in columns:
+            mapping[column] = columns[column]
+            continue
+        match = next((lookup[alias] for alias in aliases if alias in lookup), None)
+        if match is not None:
+            mapping[column] = match
+    missing = [column for column in REQUIRED_COLUMNS if column not in mapping]
+    if missing:
+        raise ValueError(f"No column for {missing}, expected one of "
+                         f"{[COLUMN_ALIASES[column] for column in missing]}")
+    return mapping
+
+
+def read_chunks(source, file_format, chunk_size=CHUNK_SIZE, columns=None):
+    """
+    Streams a CSV or Parquet file as DataFrames of at most `chunk_size` rows, with the store
+    column names. Only the matched columns are read.
+    Parameters:
+        source (str or file-like): Path or open binary file, e.g. a Streamlit upload.
+        file_format (str): 'csv' or 'parquet'.
+        chunk_size (int): Rows per chunk.
+        columns (dict): See `resolve_columns`.
+    """
+    if file_format == 'parquet':
+        parquet = pq.ParquetFile(source)
+        mapping = resolve_columns(parquet.schema_arrow.names, columns)
+        for batch in parquet.iter_batches(batch_size=chunk_size, columns=list(mapping.values())):
+            yield batch.to_pandas().rename(columns={file: store for store, file in mapping.items()})
+    elif file_format == 'csv':
+        # The header is only known with the first chunk, so every column that could match is read
+        wanted = {alias for aliases in COLUMN_ALIASES.values() for alias in aliases}
+        explicit = set((columns or {}).values())
+        reader = pd.read_csv(source, chunksize=chunk_size,
+                             usecols=lambda name: name.strip().lower() in wanted or name in explicit)
+        mapping = None
+        for chunk in reader:
+            mapping = mapping or resolve_columns(chunk.columns, columns)
+            yield chunk[list(mapping.values())].set_axis(list(mapping), axis=1)
+    else:
+        raise ValueError(f"Unknown file format '{file_format}', expected 'csv' or 'parquet'")
+
+
+def clean_chunk(chunk, rejected):
+    """
+    Types the columns of a chunk and drops its invalid rows, counted in `rejected` by reason.
+    Without a Demand column every delivery point is one unit of demand.
+    Returns:
+        DataFrame: Valid rows with lat, lng, Demand and customers columns, plus the optional ones.
+    """
+    lat = pd.to_numeric(chunk['lat'], errors='coerce').to_numpy(dtype=float)
+    lng = pd.to_numeric(chunk['lng'], errors='coerce').to_numpy(dtype=float)
+    with np.errstate(invalid='ignore'):
+        valid = (np.abs(lat) <= 90) & (np.abs(lng) <= 180)
+    rejected['coordinates'] += int((~valid).sum())
+
+    if 'Demand' in chunk:
+        demand = pd.to_numeric(chunk['Demand'], errors='coerce').to_numpy(dtype=float)
+        # Customers without demand are not served, so they are rejected with the invalid demands
+        with np.errstate(invalid='ignore'):
+            invalid_demand = valid & ~(demand > 0)
+        rejected['demand'] += int(invalid_demand.sum())
+        valid &= ~invalid_demand
+    else:
+        demand = np.ones(len(chunk))
+
+    clean = pd.DataFrame({
+        'lat': lat[valid].round(COORDINATE_DECIMALS),
+        'lng': lng[valid].round(COORDINATE_DECIMALS),
+        'Demand': demand[valid],
+        'customers': np.ones(int(valid.sum()), dtype=np.int64),
+    })
+    if 'population' in chunk:
+        clean['population'] = pd.to_numeric(chunk['population'], errors='coerce').to_numpy(dtype=float)[valid]
+    for column in ('city', 'admin_name'):
+        if column in chunk:
+            clean[column] = chunk[column].to_numpy()[valid]
+    return clean
+
+
+def aggregate(df):
+    """
+    Merges the rows sharing coordinates: demands and delivery points add up, the largest
+    population and the first names are kept.
+    """
+    rules = {'Demand': 'sum', 'customers': 'sum', 'population': 'max', 'city': 'first', 'admin_name': 'first'}
+    return df.groupby(['lat', 'lng'], sort=False, as_index=False) \
+        .agg({column: rule for column, rule in rules.items() if column in df})
+
+
+def ingest(source, name, file_format=None, chunk_size=CHUNK_SIZE, columns=None):
+    """
+    Streams a customer file into the columnar store as the dataset `name`, replacing a dataset
+    of the same name. Load it back with `loader.load_dataset`.
+    Parameters:
+        source (str or file-like): Path or open binary file, e.g. a Streamlit upload.
+        name (str): Name of the dataset, letters, digits, '-' and '_'.
+        file_format (str): 'csv' or 'parquet', guessed from the file name when omitted.
+        chunk_size (int): Rows read at a time.
+        columns (dict): Explicit store column -> file column mapping, see `COLUMN_ALIASES`.
+    Returns:
+        dict: Rows read, rows rejected by reason, duplicates merged, locations stored, path and seconds.
+    """
+    if not NAME_PATTERN.match(name):
+        raise ValueError(f"Invalid dataset name '{name}', use letters, digits, '-' and '_'")
+    if file_format is None:
+        filename = source if isinstance(source, str) else getattr(source, 'name', '')
+        file_format = 'parquet' if filename.lower().endswith('.parquet') else 'csv'
+
+    rows, valid_rows = 0, 0
+    rejected = {'coordinates': 0, 'demand': 0}
+    with span('ingest', dataset=name, format=file_format) as ingest_span:
+        partials, partial_rows = [], 0
+        for chunk in read_chunks(source, file_format, chunk_size, columns):
+            with span('ingest.chunk', rows=len(chunk)):
+                clean = clean_chunk(chunk, rejected)
+                rows, valid_rows = rows + len(chunk), valid_rows + len(clean)
+                partials.append(aggregate(clean))
+                partial_rows += len(partials[-1])
+                # Partial aggregates are merged once they grow, duplicates across chunks collapse there
+                if partial_rows > MERGE_ROWS:
+                    partials = [aggregate(pd.concat(partials, ignore_index=True))]
+                    partial_rows = len(partials[0])
+            count('ingest.rows', len(chunk))
+
+        if not partials:
+            raise ValueError("The file has no rows")
+        with span('ingest.write'):
+            df = aggregate(pd.concat(partials, ignore_index=True)).sort_values(['lat', 'lng'], ignore_index=True)
+            for column, dtype in (('city', 'string'), ('admin_name', 'category')):
+                if column in df:
+                    df[column] = df[column].astype(dtype)
+            if df.empty:
+                raise ValueError(f"No valid rows in the file, rejected: {rejected}")
+            path = loader.dataset_path(name)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # Written aside then moved, so readers never see a partial file
+            df.to_parquet(path + '.tmp', index=False)
+            os.replace(path + '.tmp', path)
+
+    return {
+        'dataset': name,
+        'rows': rows,
+        'rejected': rejected,
+        'duplicates_merged': valid_rows - len(df),
+        'locations': len(df),
+        'path': path,
+        'seconds': ingest_span['duration'],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a customer CSV or Parquet file into the columnar store.")
+    parser.add_argument('path')
+    parser.add_argument('--name', help="Dataset name, derived from the file name by default")
+    parser.add_argument('--format', choices=('csv', 'parquet'), default=None)
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    summary = ingest(args.path, args.name or dataset_name(args.path), args.format, args.chunk_size)
+    print(f"{summary['rows']:,} rows read, {sum(summary['rejected'].values()):,} rejected {summary['rejected']}, "
+          f"{summary['duplicates_merged']:,} duplicates merged, {summary['locations']:,} locations stored "
+          f"in {summary['path']} ({summary['seconds']:.1f} s)")
+
+
+if __name__ == '__main__':
+    main()
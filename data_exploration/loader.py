@@ -0,0 +1,154 @@
+import glob
+import os
+from functools import lru_cache
+import pandas as pd
+from profiling.trace import count, span
+
+# SimpleMaps world cities sheet, the csv export is preferred over the excel file when present
+DATA_DIR = 'simplemaps_worldcities_basicv1.76'
+SOURCE_FILES = [os.path.join(DATA_DIR, 'worldcities.csv'),
+                os.path.join(DATA_DIR, 'worldcities.xlsx')]
+
+# Columnar store with one parquet file per iso3 code, and one per uploaded customer dataset
+STORE_DIR = os.path.join(DATA_DIR, 'store')
+STORE_MARKER = os.path.join(STORE_DIR, '_BUILT')
+
+# Columns kept from the sheet and their types
+COLUMN_TYPES = {
+    'city': 'string',
+    'lat': 'float64',
+    'lng': 'float64',
+    'iso3': 'category',
+    'population': 'float64',
+    'capital': 'category',
+    'admin_name': 'category',
+    'country': 'category',
+}
+
+
+def source_file():
+    """
+    Returns:
+        str: Path of the world cities sheet to convert.
+    """
+    for path in SOURCE_FILES:
+        if os.path.exists(path):
+            return path
+    raise FileNotFoundError(f"None of {SOURCE_FILES} exists")
+
+
+def read_source(path):
+    """
+    Reads the world cities sheet with the typed columns of `COLUMN_TYPES`.
+    """
+    if path.endswith('.csv'):
+        df = pd.read_csv(path, usecols=list(COLUMN_TYPES))
+    else:
+        df = pd.read_excel(path, usecols=list(COLUMN_TYPES))
+    return df[list(COLUMN_TYPES)].astype(COLUMN_TYPES)
+
+
+def build_store(force=False):
+    """
+    Converts the world cities sheet into the columnar store, once. The store is rebuilt when the
+    sheet is newer than it.
+    Parameters:
+        force (bool): Rebuild even if the store is up to date.
+    Returns:
+        float: Seconds spent building the store, 0 when it was up to date.
+    """
+    path = source_file()
+    if not force and os.path.exists(STORE_MARKER) and \
+            os.path.getmtime(STORE_MARKER) >= os.path.getmtime(path):
+        return 0.0
+
+    with span('data.build_store') as build_span:
+        build_partitions(read_source(path))
+    return build_span['duration']
+
+
+def build_partitions(df):
+    """
+    Writes one parquet partition per country of the cities, replacing the previous countries.
+    Uploaded datasets are kept.
+    """
+    os.makedirs(STORE_DIR, exist_ok=True)
+    for stale in glob.glob(os.path.join(STORE_DIR, 'iso3=*.parquet')):
+        os.remove(stale)
+    for iso3, partition in df.groupby('iso3', observed=True):
+        partition = partition.reset_index(drop=True)
+        for column, dtype in COLUMN_TYPES.items():
+            if dtype == 'category':
+                partition[column] = partition[column].cat.remove_unused_categories()
+        partition.to_parquet(partition_path(iso3), index=False)
+    open(STORE_MARKER, 'w').close()
+    load_partition.cache_clear()
+
+
+def partition_path(iso3):
+    return os.path.join(STORE_DIR, f'iso3={iso3}.parquet')
+
+
+def iso3_codes():
+    """
+    Returns:
+        list: Country codes available in the store.
+    """
+    build_store()
+    return sorted(os.path.basename(path)[len('iso3='):-len('.parquet')]
+                  for path in glob.glob(os.path.join(STORE_DIR, 'iso3=*.parquet')))
+
+
+@lru_cache(maxsize=32)
+def load_partition(iso3):
+    path = partition_path(iso3)
+    if not os.path.exists(path):
+        return pd.DataFrame({column: pd.Series(dtype=dtype) for column, dtype in COLUMN_TYPES.items()})
+    return pd.read_parquet(path)
+
+
+def load_country(iso3):
+    """
+    Loads the cities of one country from the columnar store, building the store on first use.
+    Parameters:
+        iso3 (str): Country code, case insensitive.
+    Returns:
+        DataFrame: Cities of the country, empty for an unknown code. The frame is a copy and
+        can be modified by the caller.
+    """
+    build_store()
+    with span('data.load', iso3=iso3.upper()):
+        df = load_partition(iso3.upper()).copy()
+    count('data.rows', len(df))
+    return df
+
+
+def dataset_path(name):
+    return os.path.join(STORE_DIR, f'dataset={name}.parquet')
+
+
+def dataset_names():
+    """
+    Returns:
+        list: Names of the customer datasets uploaded to the store, see `data_exploration.ingest`.
+    """
+    return sorted(os.path.basename(path)[len('dataset='):-len('.parquet')]
+                  for path in glob.glob(os.path.join(STORE_DIR, 'dataset=*.parquet')))
+
+
+def load_dataset(name):
+    """
+    Loads an uploaded customer dataset from the columnar store.
+    Parameters:
+        name (str): Name given at ingestion.
+    Returns:
+        DataFrame: One row per distinct location with lat, lng, Demand and customers columns,
+        plus the optional city, admin_name and population columns of the file.
+    """
+    path = dataset_path(name)
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"No uploaded dataset named '{name}'")
+    with span('data.load', dataset=name):
+        df = pd.read_parquet(path)
+    count('data.rows', len(df))
+    return df
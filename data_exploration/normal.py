@@ -1,11 +1,84 @@
+import hashlib
 import pandas as pd
 import numpy as np
+from profiling.trace import span
 
-FRACTION_DEMAND = 0.02  
+FRACTION_DEMAND = 0.02
+MIN_POPULATION = 10000
+NOISE = 10
 
-def normal_data(df):
-    df = df.dropna(subset=['city', 'lat', 'lng', 'population','admin_name']).reset_index(drop=True)
-    df = df.drop(df[df['population'] < 10000].index).reset_index(drop=True)
-    df['Demand'] = np.floor(
-    FRACTION_DEMAND * df.population + np.random.uniform(-10, 10, size=(df.shape[0],)))
+# Seed of the demand noise, so the same country always gets the same demand
+DEFAULT_SEED = 0
+
+
+def population_demand(df, rng, fraction=FRACTION_DEMAND):
+    """
+    Demand proportional to the population, with uniform noise.
+    """
+    return np.floor(fraction * df.population + rng.uniform(-NOISE, NOISE, size=(df.shape[0],)))
+
+
+def log_demand(df, rng, fraction=FRACTION_DEMAND):
+    """
+    Demand growing with the order of magnitude of the population, so big cities do not dominate.
+    A city at the population threshold gets the same demand as with `population_demand`.
+    """
+    scale = fraction * MIN_POPULATION
+    return np.floor(scale * (1 + np.log10(df.population / MIN_POPULATION)) +
+                    rng.uniform(-NOISE, NOISE, size=(df.shape[0],)))
+
+
+def column_demand(df, rng, column='Demand'):
+    """
+    Demand read from a column supplied with the data, kept as given, fractions included.
+    """
+    return pd.to_numeric(df[column], errors='coerce').fillna(0).to_numpy(dtype=float)
+
+
+# Pluggable demand models, called with the cleaned DataFrame, a numpy Generator and the model parameters
+DEMAND_MODELS = {
+    'population': population_demand,
+    'log': log_demand,
+    'column': column_demand,
+}
+
+# Models reading the population, they only keep complete cities above MIN_POPULATION
+POPULATION_MODELS = ('population', 'log')
+CITY_COLUMNS = ['city', 'lat', 'lng', 'population', 'admin_name']
+
+
+def normal_data(df, seed=DEFAULT_SEED, demand_model='population', **demand_params):
+    """
+    Cleans the cities and adds their Demand column, with one boolean mask and one copy of the rows.
+    Parameters:
+        df (DataFrame): Cities with city, lat, lng, population and admin_name columns, or customers
+            with lat, lng and Demand columns for the 'column' model.
+        seed (int or np.random.Generator): Seed or generator of the demand noise.
+        demand_model (str): Key of `DEMAND_MODELS`.
+        demand_params: Extra parameters of the demand model.
+    Returns:
+        DataFrame: Cleaned cities with their Demand, identical for identical inputs.
+    """
+    rng = np.random.default_rng(seed)
+    with span('data.clean', rows=len(df)):
+        if demand_model in POPULATION_MODELS:
+            keep = df[CITY_COLUMNS].notna().all(axis=1) & (df['population'] >= MIN_POPULATION)
+        else:
+            keep = df[['lat', 'lng']].notna().all(axis=1)
+        df = df.loc[keep].reset_index(drop=True)
+    with span('data.demand', model=demand_model, customers=len(df)):
+        df['Demand'] = DEMAND_MODELS[demand_model](df, rng, **demand_params)
     return df
+
+
+def dataset_hash(df, columns=('lat', 'lng', 'Demand')):
+    """
+    Content hash of the customers, used to key cached model runs.
+    Parameters:
+        df (DataFrame): Normalised DataFrame.
+        columns (tuple): Columns the models depend on.
+    Returns:
+        str: Hex digest, equal for DataFrames with equal values in `columns`.
+    """
+    hashes = pd.util.hash_pandas_object(df[list(columns)], index=False).to_numpy()
+    return hashlib.sha1(hashes.tobytes()).hexdigest()
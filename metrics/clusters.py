@@ -0,0 +1,145 @@
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from profiling.trace import span
+from spatial.distance import haversine_array, travelling_cost
+
+# Capacity of a warehouse above its share of the total demand
+CAPACITY_MARGIN = 0.1
+
+# Percentile of the customer distances reported per cluster
+DISTANCE_PERCENTILE = 95
+
+# Column of the cluster table holding each statistic
+TABLE_COLUMNS = {
+    'cluster': 'Cluster',
+    'customers': 'Customers per cluster',
+    'demand': 'Total Demand per Cluster in Units',
+    'mean_demand': 'Average Demand',
+    'std_demand': 'Std Dev Demand',
+    'total_distance': 'Total Distance',
+    'mean_distance': 'Average Distance',
+    'weighted_distance': 'Demand-weighted Distance',
+    'p95_distance': 'P95 Distance',
+    'utilisation': 'Utilisation',
+    'capacity': 'Capacities in Units',
+}
+
+
+@dataclass
+class ClusterMetrics:
+    """
+    Per-cluster statistics of a solution, one entry per warehouse, computed once and shared by
+    the capacity table, the maps and the charts. Distances are great-circle km.
+    """
+    cluster: np.ndarray
+    customers: np.ndarray
+    demand: np.ndarray
+    mean_demand: np.ndarray
+    std_demand: np.ndarray
+    total_distance: np.ndarray
+    mean_distance: np.ndarray
+    weighted_distance: np.ndarray
+    p95_distance: np.ndarray
+    utilisation: np.ndarray
+    capacity: float
+
+    def table(self):
+        """
+        Returns:
+            DataFrame: One row per cluster, indexed from 1, with the columns of `TABLE_COLUMNS`.
+        """
+        table = pd.DataFrame({column: getattr(self, name) for name, column in TABLE_COLUMNS.items()})
+        table.index = np.arange(1, len(table) + 1)
+        return table
+
+    @classmethod
+    def from_table(cls, table):
+        """
+        Metrics of a cluster table built by `table`, e.g. one read back from the result cache.
+        """
+        values = {name: table[column].to_numpy() for name, column in TABLE_COLUMNS.items()}
+        values['capacity'] = float(values['capacity'][0])
+        return cls(**values)
+
+
+def cluster_metrics(df, labels, centroids, capacity=None):
+    """
+    Computes every per-cluster statistic in one pass of weighted bincounts over the customers,
+    plus one sort for the distance percentile.
+    Parameters:
+        df (DataFrame): Customers with lat, lng and Demand columns.
+        labels (array-like): Cluster position of every customer.
+        centroids (array-like): Cluster centres, lat/lng in the first two columns.
+        capacity (float): Capacity of every warehouse, the demand share plus `CAPACITY_MARGIN` when omitted.
+    Returns:
+        ClusterMetrics: Statistics of the len(centroids) clusters, empty clusters included.
+    """
+    centroids = np.asarray(centroids)
+    labels = np.asarray(labels, dtype=int)
+    demand = df['Demand'].to_numpy(dtype=float)
+    k = len(centroids)
+    if capacity is None:
+        capacity = demand.sum() / k * (1 + CAPACITY_MARGIN)
+
+    with span('metrics.distance', customers=len(labels)):
+        distances = haversine_array(centroids[labels, 0], centroids[labels, 1], df['lat'], df['lng'])
+
+    def per_cluster(weights=None):
+        return np.bincount(labels, weights=weights, minlength=k)
+
+    customers = per_cluster()
+    total_demand = per_cluster(demand)
+    total_distance = per_cluster(distances)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean_demand = total_demand / customers
+        std_demand = np.sqrt(np.maximum(per_cluster(demand ** 2) / customers - mean_demand ** 2, 0))
+        mean_distance = total_distance / customers
+        weighted_distance = per_cluster(demand * distances) / total_demand
+
+    return ClusterMetrics(
+        cluster=np.arange(1, k + 1),
+        customers=customers,
+        demand=total_demand,
+        mean_demand=mean_demand,
+        std_demand=std_demand,
+        total_distance=total_distance,
+        mean_distance=mean_distance,
+        weighted_distance=weighted_distance,
+        p95_distance=segment_percentile(labels, distances, k, DISTANCE_PERCENTILE),
+        utilisation=total_demand / capacity,
+        capacity=float(capacity),
+    )
+
+
+def segment_percentile(labels, values, k, percentile):
+    """
+    Percentile of the values of every cluster, interpolated linearly like `np.percentile`.
+    Returns:
+        ndarray: One percentile per cluster, NaN for empty clusters.
+    """
+    order = np.lexsort((values, labels))
+    counts = np.bincount(labels, minlength=k)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    position = (counts - 1).clip(0) * percentile / 100
+    low, high = np.floor(position).astype(int), np.ceil(position).astype(int)
+    sorted_values = np.append(values[order], np.nan)
+    low_values = sorted_values[np.where(counts > 0, starts + low, -1)]
+    high_values = sorted_values[np.where(counts > 0, starts + high, -1)]
+    return low_values + (high_values - low_values) * (position - low)
+
+
+def evaluate_solution(df, labels, centroids):
+    """
+    Demand-weighted transport cost and average great-circle distance of customers to their warehouse.
+    Parameters:
+        df (DataFrame): DataFrame with lat, lng and Demand columns.
+        labels (array): Warehouse of every customer.
+        centroids (array): Warehouse locations, lat/lng in the first two columns.
+    Returns:
+        tuple: Transport cost and average distance in km.
+    """
+    centroids = np.asarray(centroids)[np.asarray(labels)]
+    distances = haversine_array(df['lat'].to_numpy(), df['lng'].to_numpy(), centroids[:, 0], centroids[:, 1])
+    transport_cost = float((travelling_cost(distances) * df['Demand'].to_numpy()).sum())
+    return transport_cost, float(distances.mean())
@@ -0,0 +1,85 @@
+import numpy as np
+from sklearn.cluster import kmeans_plusplus
+from spatial.projection import project
+
+# Candidate sites generated per warehouse to open, the MILP picks the warehouses among them
+CANDIDATE_FACTOR = 5
+
+# Seed of the random candidate strategies
+RANDOM_STATE = 2
+
+
+def sample_candidates(df, num_candidates, random_state=RANDOM_STATE):
+    """
+    Uniformly sampled cities, in the order `df.sample` draws them.
+    """
+    return np.random.RandomState(random_state).choice(df.shape[0], num_candidates, replace=False)
+
+
+def kmeans_plusplus_candidates(df, num_candidates, random_state=RANDOM_STATE):
+    """
+    Demand-weighted k-means++ seeding on the unit sphere: spread out cities, favouring the heavy ones.
+    """
+    points = project(df['lat'], df['lng'], 'sphere')
+    _, positions = kmeans_plusplus(points, num_candidates, sample_weight=df['Demand'].to_numpy(dtype=float),
+                                   random_state=random_state)
+    return np.sort(positions)
+
+
+def grid_candidates(df, num_candidates, random_state=RANDOM_STATE):
+    """
+    Heaviest city of each of the highest-demand cells of a latitude/longitude grid. The grid is
+    refined until it has enough non-empty cells.
+    """
+    lat, lng = df['lat'].to_numpy(dtype=float), df['lng'].to_numpy(dtype=float)
+    demand = df['Demand'].to_numpy(dtype=float)
+    side = int(np.ceil(np.sqrt(num_candidates)))
+    while True:
+        rows = np.floor((lat - lat.min()) / (np.ptp(lat) or 1) * side).clip(0, side - 1).astype(int)
+        cols = np.floor((lng - lng.min()) / (np.ptp(lng) or 1) * side).clip(0, side - 1).astype(int)
+        cells, cell_of = np.unique(rows * side + cols, return_inverse=True)
+        if len(cells) >= num_candidates or side >= df.shape[0]:
+            break
+        side *= 2
+
+    # Heaviest city per cell, then the heaviest cells
+    order = np.lexsort((-demand, cell_of))
+    _, first = np.unique(cell_of[order], return_index=True)
+    heaviest = order[first]
+    cell_demand = np.bincount(cell_of, weights=demand)
+    return np.sort(heaviest[np.argsort(-cell_demand, kind='stable')[:num_candidates]])
+
+
+def population_candidates(df, num_candidates, random_state=RANDOM_STATE):
+    """
+    Most populated cities, by Demand when the population is missing.
+    """
+    size = df['population'] if 'population' in df else df['Demand']
+    return np.sort(np.argsort(-size.to_numpy(dtype=float), kind='stable')[:num_candidates])
+
+
+# Candidate site strategies, called with the customers, the number of candidates and a seed
+CANDIDATE_METHODS = {
+    'sample': sample_candidates,
+    'kmeans++': kmeans_plusplus_candidates,
+    'grid': grid_candidates,
+    'population': population_candidates,
+}
+
+
+def candidate_sites(df, num_clusters, method='kmeans++', factor=CANDIDATE_FACTOR, random_state=RANDOM_STATE):
+    """
+    Candidate warehouse sites, chosen among the customers.
+    Parameters:
+        df (DataFrame): Preprocessed DataFrame.
+        num_clusters (int): Number of warehouses to open.
+        method (str): Key of `CANDIDATE_METHODS`.
+        factor (float): Candidates per warehouse, 1 keeps exactly `num_clusters` sites.
+        random_state (int): Seed of the random strategies.
+    Returns:
+        ndarray: Positions in df of the min(N, factor * num_clusters) candidates.
+    """
+    if method not in CANDIDATE_METHODS:
+        raise ValueError(f"Unknown candidate method '{method}', expected one of {list(CANDIDATE_METHODS)}")
+    num_candidates = int(min(df.shape[0], max(num_clusters, round(factor * num_clusters))))
+    return CANDIDATE_METHODS[method](df, num_candidates, random_state)
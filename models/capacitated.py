@@ -0,0 +1,122 @@
+import numpy as np
+from sklearn.cluster import kmeans_plusplus
+from models.kmeans import RANDOM_STATE, warm_start_centroids
+from models.pulp_model import repair_capacity
+from metrics.clusters import CAPACITY_MARGIN
+from profiling.trace import count, span
+from spatial.distance import haversine_matrix
+from spatial.index import SpatialIndex
+from spatial.projection import project, unproject
+
+# Alternations of assignment and centroid update, and price updates per assignment
+MAX_ITER = 30
+PRICE_ITERATIONS = 50
+
+# Price step, as a fraction of the mean customer to centroid distance per unit of relative overload
+PRICE_STEP = 0.5
+
+# Iterations stop once fewer than this share of the customers change cluster
+TOLERANCE = 1e-3
+
+# Precision of the distance matrix, single precision is plenty for a heuristic and halves the work
+DTYPE = np.float32
+
+
+def get_capacitated(df, num_clusters, previous_solution=None, random_state=RANDOM_STATE, report=None):
+    """
+    Executes the capacitated K-Means heuristic.
+    Parameters:
+        df (DataFrame): Preprocessed DataFrame.
+        num_clusters (int): Number of clusters.
+        previous_solution (tuple): Labels and centroids of an earlier run, used to initialise the centroids.
+        random_state (int): Seed of the initialisation.
+        report (dict): Optional dictionary filled with the iterations and the final utilisation.
+    Returns:
+        tuple: Tuple containing the updated DataFrame, cluster labels and centroid centers.
+    """
+    return capacitated_kmeans(df, num_clusters, previous_solution, random_state, report)
+
+
+def capacitated_kmeans(df, num_clusters, previous_solution=None, random_state=RANDOM_STATE, report=None):
+    """
+    K-Means whose assignment step respects the warehouse capacity. Customers go to the centroid
+    minimising distance plus a capacity price; the prices rise on overloaded clusters
+    (Lagrangian relaxation of the capacity constraints, solved by subgradient steps) and the
+    capacity repair of the PuLP model removes the remaining overloads. Every step works on the
+    (K, N) distance matrix, so an iteration is linear in the number of customers.
+    Parameters:
+        df (DataFrame): Preprocessed DataFrame.
+        num_clusters (int): Number of clusters.
+        previous_solution (tuple): Labels and centroids of an earlier run.
+        random_state (int): Seed of the initialisation.
+        report (dict): Optional dictionary filled with the iterations and the final utilisation.
+    Returns:
+        tuple: Tuple containing the updated DataFrame, cluster labels and centroid centers.
+    """
+    lat, lng = df['lat'].to_numpy(dtype=float), df['lng'].to_numpy(dtype=float)
+    demand = df['Demand'].to_numpy(dtype=float)
+    capacity = np.full(num_clusters, demand.sum() / num_clusters * (1 + CAPACITY_MARGIN))
+    points = project(lat, lng, 'sphere')
+
+    # Demand-weighted k-means++ seeding, or the previous centroids
+    if previous_solution is not None:
+        previous_centroids = np.asarray(previous_solution[1])
+        seeds = warm_start_centroids(
+            points, project(previous_centroids[:, 0], previous_centroids[:, 1], 'sphere'), num_clusters)
+    else:
+        seeds, _ = kmeans_plusplus(points, num_clusters, sample_weight=demand, random_state=random_state)
+    centroids = unproject(seeds, 'sphere')
+
+    labels = None
+    prices = np.zeros(num_clusters, dtype=DTYPE)
+    for iteration in range(1, MAX_ITER + 1):
+        with span('capacitated.distance'):
+            distances = haversine_matrix(centroids[:, 0], centroids[:, 1], lat, lng, dtype=DTYPE)
+        with span('capacitated.assign'):
+            new_labels, prices = priced_assignment(distances, demand, capacity, prices)
+        with span('capacitated.repair'):
+            new_labels = repair_capacity(new_labels, demand, capacity, SpatialIndex.from_frame(centroids), lat, lng)
+        count('capacitated.iterations')
+        converged = labels is not None and np.mean(new_labels != labels) < TOLERANCE
+        labels = new_labels
+        if converged:
+            break
+
+        # Demand-weighted centres on the sphere, empty clusters keep their centroid
+        sums = np.zeros((num_clusters, 3))
+        np.add.at(sums, labels, points * demand[:, None])
+        filled = np.bincount(labels, minlength=num_clusters) > 0
+        centroids[filled] = unproject(sums[filled], 'sphere')
+
+    if report is not None:
+        load = np.bincount(labels, weights=demand, minlength=num_clusters)
+        report.update({
+            'iterations': iteration,
+            'max_utilisation': float((load / capacity).max()),
+            'over_capacity_clusters': int((load > capacity).sum()),
+        })
+
+    df['Cluster'] = labels
+    return df, labels, centroids
+
+
+def priced_assignment(distances, demand, capacity, prices):
+    """
+    Assigns every customer to the cluster minimising distance plus price, raising the price of
+    overloaded clusters and lowering the others until the loads fit or the iterations run out.
+    Parameters:
+        distances (ndarray): (K, N) distances from the centroids to the customers.
+        demand (ndarray): Demand of every customer.
+        capacity (ndarray): Capacity of every cluster.
+        prices (ndarray): Starting prices, e.g. those of the previous iteration.
+    Returns:
+        tuple: Labels and the final prices.
+    """
+    step = PRICE_STEP * distances.min(axis=0).mean()
+    for _ in range(PRICE_ITERATIONS):
+        labels = np.argmin(distances + prices[:, None], axis=0)
+        overload = np.bincount(labels, weights=demand, minlength=len(capacity)) / capacity - 1
+        if (overload <= 0).all():
+            break
+        prices = np.maximum(0, prices + step * overload).astype(distances.dtype)
+    return labels, prices
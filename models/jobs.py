@@ -0,0 +1,207 @@
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import traceback
+import uuid
+from multiprocessing import util
+from metrics import capacity
+from models.reduction import solve_reduced
+from profiling.trace import recording, span
+
+# Number of jobs solved at the same time and default time allowed to a job, in seconds
+MAX_WORKERS = 2
+JOB_TIMEOUT = 600
+
+# Seconds a finished job is kept for collection, e.g. by a session that ended before it finished
+RESULT_TTL = 3600
+
+# States of a job, EXPIRED being reported for the jobs forgotten after `RESULT_TTL`
+PENDING, RUNNING, DONE, FAILED, CANCELLED, TIMEOUT = 'pending', 'running', 'done', 'failed', 'cancelled', 'timeout'
+EXPIRED = 'expired'
+FINISHED = (DONE, FAILED, CANCELLED, TIMEOUT)
+
+
+def run_model(model, df, num_clusters, params, profile=None, reduction=None):
+    """
+    Runs a model and builds its capacity table, the unit of work of a model job.
+    Parameters:
+        model (function): Model function of `MODELS_TYPES`.
+        df (DataFrame): Preprocessed DataFrame.
+        num_clusters (int): Number of clusters.
+        params (dict): Extra keyword arguments of the model.
+        profile (str): Name of a stage to run under cProfile, see `profiling.trace`.
+        reduction (dict): Keyword arguments of `models.reduction.solve_reduced` (max_points, method,
+            compare_full) to solve on demand-weighted super-points, None to solve every customer.
+    Returns:
+        dict: The clustered DataFrame, labels, centroids, cluster table, capacity, model report,
+        reduction report and the trace of the run.
+    """
+    reduction_report = None
+    with recording(profile) as trace:
+        with span('model', model=model.__name__, warehouses=num_clusters):
+            if reduction is None:
+                df, labels, centroids = model(df, num_clusters, **params)
+            else:
+                reduction_report = {}
+                df, labels, centroids = solve_reduced(model, df, num_clusters, params, report=reduction_report,
+                                                      **reduction)
+        cluster_table, cap = capacity.capcacity_display(df, centroids)
+    return {'df': df, 'labels': labels, 'centroids': centroids, 'cluster_table': cluster_table, 'cap': cap,
+            'report': params.get('report'), 'reduction': reduction_report, 'trace': trace}
+
+
+def _worker(conn, function, args, kwargs):
+    # Own process group, so stopping the job also stops the solver executables it launched
+    if hasattr(os, 'setpgrp'):
+        os.setpgrp()
+    try:
+        conn.send((DONE, function(*args, **kwargs)))
+    except Exception:
+        conn.send((FAILED, traceback.format_exc()))
+    finally:
+        conn.close()
+
+
+class JobManager:
+    """
+    Bounded pool of worker processes running jobs in the background. Every job gets its own
+    process, so it can be cancelled or stopped at its timeout by terminating it, and at most
+    `max_workers` jobs run at the same time while the others wait in submission order.
+    The state of the jobs is advanced whenever they are polled, and finished jobs nobody collected
+    are forgotten `result_ttl` seconds after they finished.
+    """
+
+    def __init__(self, max_workers=MAX_WORKERS, timeout=JOB_TIMEOUT, result_ttl=RESULT_TTL):
+        self.max_workers = max_workers
+        self.timeout = timeout
+        self.result_ttl = result_ttl
+        self.jobs = {}
+        self.lock = threading.Lock()
+        # Fresh interpreters, so CBC and sklearn do not inherit the threads of the server
+        self.context = multiprocessing.get_context('spawn')
+        # The workers are not daemonic so a job can run its own process pool, e.g. a K sweep, hence
+        # they are stopped at exit before multiprocessing waits for its non-daemonic children
+        util.Finalize(self, self.shutdown, exitpriority=10)
+
+    def submit(self, function, *args, timeout=None, **kwargs):
+        """
+        Queues a call of `function`, which must be importable from a module.
+        Parameters:
+            timeout (float): Seconds the job may run, the manager default when omitted.
+        Returns:
+            str: Id of the job.
+        """
+        job_id = uuid.uuid4().hex
+        with self.lock:
+            self.jobs[job_id] = {
+                'status': PENDING, 'call': (function, args, kwargs),
+                'timeout': timeout or self.timeout,
+                'submitted': time.time(), 'started': None, 'finished': None,
+                'process': None, 'conn': None, 'result': None, 'error': None,
+            }
+            self._schedule()
+        return job_id
+
+    def status(self, job_id):
+        """
+        Returns:
+            dict: Status of the job, its elapsed running time and, while pending, its position in the queue.
+        """
+        with self.lock:
+            self._schedule()
+            job = self.jobs.get(job_id)
+            if job is None:
+                return {'status': EXPIRED, 'error': 'The job finished too long ago and was forgotten'}
+            status = {'status': job['status'], 'error': job['error']}
+            if job['started'] is not None:
+                status['elapsed'] = (job['finished'] or time.time()) - job['started']
+            if job['status'] == PENDING:
+                pending = [key for key, other in self.jobs.items() if other['status'] == PENDING]
+                status['position'] = pending.index(job_id) + 1
+            return status
+
+    def result(self, job_id):
+        """
+        Returns the result of a finished job and forgets the job.
+        """
+        with self.lock:
+            self._schedule()
+            job = self.jobs.get(job_id)
+            if job is None:
+                raise RuntimeError(f"Job {job_id} {EXPIRED}: its result was kept {self.result_ttl} s")
+            if job['status'] not in FINISHED:
+                raise RuntimeError(f"Job {job_id} is still {job['status']}")
+            del self.jobs[job_id]
+        if job['status'] != DONE:
+            raise RuntimeError(f"Job {job_id} {job['status']}: {job['error']}")
+        return job['result']
+
+    def cancel(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job['status'] in (PENDING, RUNNING):
+                self._stop(job, CANCELLED, 'Cancelled by the user')
+            self._schedule()
+
+    def shutdown(self):
+        """
+        Stops every pending and running job.
+        """
+        with self.lock:
+            for job in self.jobs.values():
+                if job['status'] in (PENDING, RUNNING):
+                    self._stop(job, CANCELLED, 'The server stopped')
+
+    def _schedule(self):
+        # Forget the jobs finished for longer than the TTL, whose results nobody collected
+        now = time.time()
+        for job_id in [job_id for job_id, job in self.jobs.items()
+                       if job['status'] in FINISHED and now - job['finished'] > self.result_ttl]:
+            del self.jobs[job_id]
+
+        # Collect finished and overdue jobs, then start pending ones on the free workers
+        for job in self.jobs.values():
+            if job['status'] != RUNNING:
+                continue
+            if job['conn'].poll():
+                try:
+                    job['status'], payload = job['conn'].recv()
+                except EOFError:
+                    job['status'], payload = FAILED, 'The worker exited without a result'
+                job['result' if job['status'] == DONE else 'error'] = payload
+                job['finished'] = time.time()
+                job['process'].join()
+                job['conn'].close()
+            elif not job['process'].is_alive():
+                self._stop(job, FAILED, f"The worker exited with code {job['process'].exitcode}")
+            elif time.time() - job['started'] > job['timeout']:
+                self._stop(job, TIMEOUT, f"Stopped after {job['timeout']} s")
+
+        running = sum(job['status'] == RUNNING for job in self.jobs.values())
+        for job in self.jobs.values():
+            if running >= self.max_workers:
+                break
+            if job['status'] == PENDING:
+                self._start(job)
+                running += 1
+
+    def _start(self, job):
+        function, args, kwargs = job['call']
+        receiver, sender = self.context.Pipe(duplex=False)
+        job['process'] = self.context.Process(target=_worker, args=(sender, function, args, kwargs))
+        job['process'].start()
+        sender.close()
+        job['conn'] = receiver
+        job['status'], job['started'] = RUNNING, time.time()
+
+    def _stop(self, job, status, error):
+        if job['process'] is not None:
+            try:
+                os.killpg(job['process'].pid, signal.SIGTERM)
+            except (AttributeError, ProcessLookupError, PermissionError):
+                job['process'].terminate()
+            job['process'].join()
+            job['conn'].close()
+        job['status'], job['error'], job['finished'] = status, error, time.time()
@@ -1,37 +1,93 @@
-from sklearn.cluster import KMeans
+from sklearn.cluster import KMeans, MiniBatchKMeans
+import numpy as np
 import pandas as pd
-from sklearn.cluster import KMeans
 from sklearn.preprocessing import MinMaxScaler
+from profiling.trace import count, span
+from spatial.projection import project, unproject
 
+# Fixed seed and number of initialisations, so the same inputs give the same clusters
+RANDOM_STATE = 0
+N_INIT = 10
 
-def get_kmeans(df, num_clusters):
+# From this number of customers MiniBatchKMeans replaces KMeans
+MINIBATCH_THRESHOLD = 50000
+
+
+def get_kmeans(df, num_clusters, previous_solution=None, weighted=True, projection='sphere',
+               random_state=RANDOM_STATE, n_init=N_INIT):
     """
     Executes the K-Means algorithm with weighted or fixed inputs.
     Parameters:
         df (DataFrame): Preprocessed DataFrame.
         num_clusters (int): Number of clusters.
-        dataset_type (str): Selected dataset type.
+        previous_solution (tuple): Labels and centroids of an earlier run on the same customers,
+            possibly with another number of clusters, used to initialise the centroids.
+        weighted (bool): Weight the customers by their Demand.
+        projection (str): Space the clustering runs in, see `spatial.projection.project`.
+        random_state (int): Seed of the initialisation.
+        n_init (int): Number of initialisations without a previous solution.
     Returns:
         tuple: Tuple containing the updated DataFrame, cluster labels and centroid centers.
     """
 
-    return K_Means_algo_fixed(df, num_clusters)
+    return K_Means_algo_fixed(df, num_clusters, previous_solution, weighted=weighted, projection=projection,
+                              random_state=random_state, n_init=n_init)
+
 
+def K_Means_algo_fixed(df, num_clusters, previous_solution=None, weighted=True, projection='sphere',
+                       random_state=RANDOM_STATE, n_init=N_INIT):
+    # Project latitude and longitude so that Euclidean distances follow ground distances
+    ref_lat = df['lat'].mean()
+    with span('kmeans.project', projection=projection):
+        coordinates = project(df['lat'], df['lng'], projection, ref_lat)
+    sample_weight = df['Demand'].to_numpy(dtype=float) if weighted else None
 
-def K_Means_algo_fixed(df, num_clusters):
-    # Extract latitude and longitude columns
-    coordinates = df[['lat', 'lng']]
+    # Large datasets are clustered on mini batches
+    algorithm = MiniBatchKMeans if len(df) >= MINIBATCH_THRESHOLD else KMeans
 
-    # Fit K-means clustering model
-    kmeans = KMeans(n_clusters=num_clusters)
-    kmeans.fit(coordinates)
+    # Fit K-means clustering model, starting from the previous centroids when there are some
+    if previous_solution is not None:
+        previous_centroids = np.asarray(previous_solution[1])
+        init = warm_start_centroids(
+            coordinates, project(previous_centroids[:, 0], previous_centroids[:, 1], projection, ref_lat), num_clusters)
+        kmeans = algorithm(n_clusters=num_clusters, init=init, n_init=1, random_state=random_state)
+    else:
+        kmeans = algorithm(n_clusters=num_clusters, n_init=n_init, random_state=random_state)
+    with span('kmeans.fit', algorithm=algorithm.__name__, customers=len(df)):
+        kmeans.fit(coordinates, sample_weight=sample_weight)
+    count('kmeans.customers', len(df))
+    count('kmeans.iterations', int(kmeans.n_iter_))
 
     # Get the cluster labels
     cluster_labels = kmeans.labels_
 
-    # Get cluster centroids
-    centroids = kmeans.cluster_centers_
+    # Get cluster centroids as lat/lng
+    centroids = unproject(kmeans.cluster_centers_, projection, ref_lat)
 
     # Add the cluster labels to the dataset
     df['Cluster'] = cluster_labels
-    return df, cluster_labels, centroids
\ No newline at end of file
+    return df, cluster_labels, centroids
+
+
+def warm_start_centroids(coordinates, centroids, num_clusters):
+    """
+    Adapt the centroids of a previous run to a new number of clusters. A missing centroid is
+    seeded at the point farthest from the current centroids, a surplus one is dropped with the
+    cluster holding the fewest points.
+    Parameters:
+        coordinates (ndarray): (N, D) points, in the space the clustering runs in.
+        centroids (ndarray): Centroids of the previous run, in the same space.
+        num_clusters (int): Number of clusters of the new run.
+    Returns:
+        ndarray: (num_clusters, D) initial centroids.
+    """
+    centroids = np.asarray(centroids, dtype=float)
+    while len(centroids) != num_clusters:
+        distances = ((coordinates[:, None, :] - centroids[None, :, :]) ** 2).sum(axis=2)
+        if len(centroids) < num_clusters:
+            farthest = distances.min(axis=1).argmax()
+            centroids = np.vstack([centroids, coordinates[farthest]])
+        else:
+            counts = np.bincount(distances.argmin(axis=1), minlength=len(centroids))
+            centroids = np.delete(centroids, counts.argmin(), axis=0)
+    return centroids
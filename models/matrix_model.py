@@ -0,0 +1,334 @@
+"""
+Capacitated facility location models assembled as sparse coefficient arrays instead of PuLP
+expressions: minimise cost @ x subject to row_lower <= matrix @ x <= row_upper, lower <= x <= upper
+and x integral where `integer`. The columns are the facility variables of the K warehouses followed
+by one block per family of (customer, warehouse) pair variables, all with the pairs in the same
+customer-major order.
+
+The arrays are handed to HiGHS in one call through its array API, or turned into PuLP variables and
+constraints from pre-built coefficient lists for the other solvers, without `lpSum` arithmetic.
+"""
+import numpy as np
+import scipy.sparse as sp
+from pulp import LpProblem, LpMinimize, LpVariable, LpBinary, LpContinuous, LpAffineExpression, LpConstraint
+from pulp import LpConstraintEQ, LpConstraintLE, LpConstraintGE, LpStatus, LpSolution, value
+from profiling.trace import count, span
+
+
+def constraint_rows(blocks, num_cols):
+    """
+    Stacks row blocks into one CSR matrix.
+    Parameters:
+        blocks (list): (rows, cols, coefficients, lower, upper) of every block, with the rows
+            numbered from 0 inside the block and one bound per row of the block.
+        num_cols (int): Number of columns.
+    Returns:
+        tuple: CSR matrix, lower and upper bounds of the rows.
+    """
+    offsets = np.cumsum([0] + [len(block[3]) for block in blocks])
+    rows = np.concatenate([block[0] + offset for block, offset in zip(blocks, offsets)])
+    matrix = sp.csr_matrix((np.concatenate([block[2] for block in blocks]).astype(float),
+                            (rows, np.concatenate([block[1] for block in blocks]))),
+                           shape=(offsets[-1], num_cols))
+    matrix.sort_indices()
+    return (matrix, np.concatenate([block[3] for block in blocks]).astype(float),
+            np.concatenate([block[4] for block in blocks]).astype(float))
+
+
+def cardinality_rows(num_warehouses, num_open):
+    """
+    Row opening exactly `num_open` warehouses when there are more candidate sites than that.
+    """
+    if num_open is None or num_warehouses <= num_open:
+        return []
+    return [(np.zeros(num_warehouses, dtype=np.int64), np.arange(num_warehouses), np.ones(num_warehouses),
+             np.array([num_open]), np.array([num_open]))]
+
+
+def full_arrays(transport_costs, demand, supply, setup_cost, num_open=None):
+    """
+    Arrays of the CFLP linking every customer to every warehouse: units served (Link) and
+    allocation binaries (One) for every pair, one allocation and one demand row per customer and
+    one capacity row per warehouse.
+    Parameters:
+        transport_costs (ndarray): (K, N) transport cost matrix.
+        demand (ndarray): Demand of every customer.
+        supply, setup_cost (ndarray): Capacity and setup cost of every warehouse.
+        num_open (int): Number of warehouses to open when there are more candidates.
+    Returns:
+        dict: Model arrays, see the module docstring, with the pair columns in 'pair_customer',
+        'pair_warehouse' and 'pair_columns' and the variable families in 'families'.
+    """
+    num_warehouses, num_customers = transport_costs.shape
+    num_pairs = num_customers * num_warehouses
+    pair_customer = np.repeat(np.arange(num_customers), num_warehouses)
+    pair_warehouse = np.tile(np.arange(num_warehouses), num_customers)
+    link = num_warehouses + np.arange(num_pairs)
+    one = link + num_pairs
+
+    matrix, row_lower, row_upper = constraint_rows([
+        # One User One Inventory
+        (pair_customer, one, np.ones(num_pairs), np.ones(num_customers), np.ones(num_customers)),
+        # Demand Constraint
+        (pair_customer, link, np.ones(num_pairs), demand, demand),
+        # Capacity Constraint, units served minus the supply of the warehouse when opened
+        (np.concatenate([pair_warehouse, np.arange(num_warehouses)]),
+         np.concatenate([link, np.arange(num_warehouses)]),
+         np.concatenate([np.ones(num_pairs), -supply]),
+         np.full(num_warehouses, -np.inf), np.zeros(num_warehouses)),
+    ] + cardinality_rows(num_warehouses, num_open), num_warehouses + 2 * num_pairs)
+
+    return {
+        'cost': np.concatenate([setup_cost, transport_costs.T.ravel(), np.zeros(num_pairs)]).astype(float),
+        'lower': np.zeros(num_warehouses + 2 * num_pairs),
+        'upper': np.concatenate([np.ones(num_warehouses), np.full(num_pairs, np.inf), np.ones(num_pairs)]),
+        'integer': np.concatenate([np.ones(num_warehouses, dtype=bool), np.zeros(num_pairs, dtype=bool),
+                                   np.ones(num_pairs, dtype=bool)]),
+        'matrix': matrix,
+        'row_lower': row_lower,
+        'row_upper': row_upper,
+        'families': ['Create_facility', 'Link', 'One'],
+        'pair_customer': pair_customer,
+        'pair_warehouse': pair_warehouse,
+        'pair_columns': link,
+    }
+
+
+def sparse_arrays(transport_costs, demand, supply, setup_cost, candidates, num_open=None, single_sourcing=False):
+    """
+    Arrays of the CFLP linking every customer only to its candidate warehouses. A single family of
+    assignment variables (Assign, share of the customer demand served by the warehouse) replaces
+    the Link units and the One binaries of the full model, so the model has N*k instead of 2*N*K
+    variables and one row per customer instead of two. Linking rows keep a pair below the opening
+    of its warehouse when the solver picks the warehouses among more candidates, which tightens
+    the relaxation.
+    Parameters:
+        transport_costs, demand, supply, setup_cost, num_open: See `full_arrays`.
+        candidates (ndarray): (N, k) candidate warehouse positions of every customer.
+        single_sourcing (bool): Binary assignment variables, so every customer is served by one warehouse.
+    Returns:
+        dict: Model arrays, see `full_arrays`.
+    """
+    num_warehouses = transport_costs.shape[0]
+    num_customers, k_nearest = candidates.shape
+    num_pairs = num_customers * k_nearest
+    pair_customer = np.repeat(np.arange(num_customers), k_nearest)
+    pair_warehouse = candidates.ravel()
+    assign = num_warehouses + np.arange(num_pairs)
+
+    blocks = [
+        # Demand Constraint, the whole demand is served by the candidate warehouses
+        (pair_customer, assign, np.ones(num_pairs), np.ones(num_customers), np.ones(num_customers)),
+    ]
+    if num_open is not None and num_warehouses > num_open:
+        # Linking Constraint, only opened warehouses serve
+        blocks.append((np.repeat(np.arange(num_pairs), 2), np.column_stack([assign, pair_warehouse]).ravel(),
+                       np.tile([1.0, -1.0], num_pairs), np.full(num_pairs, -np.inf), np.zeros(num_pairs)))
+    # Capacity Constraint
+    blocks.append((np.concatenate([pair_warehouse, np.arange(num_warehouses)]),
+                   np.concatenate([assign, np.arange(num_warehouses)]),
+                   np.concatenate([demand[pair_customer], -supply]),
+                   np.full(num_warehouses, -np.inf), np.zeros(num_warehouses)))
+    matrix, row_lower, row_upper = constraint_rows(blocks + cardinality_rows(num_warehouses, num_open),
+                                                   num_warehouses + num_pairs)
+
+    return {
+        'cost': np.concatenate([setup_cost, transport_costs[pair_warehouse, pair_customer] * demand[pair_customer]])
+        .astype(float),
+        'lower': np.zeros(num_warehouses + num_pairs),
+        'upper': np.ones(num_warehouses + num_pairs),
+        'integer': np.concatenate([np.ones(num_warehouses, dtype=bool), np.full(num_pairs, single_sourcing)]),
+        'matrix': matrix,
+        'row_lower': row_lower,
+        'row_upper': row_upper,
+        'families': ['Create_facility', 'Assign'],
+        'pair_customer': pair_customer,
+        'pair_warehouse': pair_warehouse,
+        'pair_columns': assign,
+    }
+
+
+def column_names(arrays):
+    """
+    PuLP names of the columns: the facility family followed by the warehouse position, the pair
+    families by the customer and warehouse positions.
+    """
+    num_warehouses = len(arrays['cost']) - len(arrays['pair_customer']) * (len(arrays['families']) - 1)
+    names = [f"{arrays['families'][0]}_{j}" for j in range(num_warehouses)]
+    pairs = [f'{i}_{j}' for i, j in zip(arrays['pair_customer'].tolist(), arrays['pair_warehouse'].tolist())]
+    for family in arrays['families'][1:]:
+        names.extend(f'{family}_{pair}' for pair in pairs)
+    return names
+
+
+def start_values(arrays, labels, amounts=None, opened=None):
+    """
+    MIP start of a model: the warehouses of `labels` are opened and every customer is served by
+    its warehouse. Pairs missing from a sparse model stay at 0, the solver completes such a partial
+    start itself.
+    Parameters:
+        arrays (dict): Model arrays.
+        labels (ndarray): Warehouse position of every customer.
+        amounts (ndarray): Value of an assigned pair per customer, 1 (a full share) when omitted.
+        opened (ndarray): Positions of the opened warehouses, those of `labels` when omitted. Give
+            them when the model opens a fixed number of warehouses and some serve no customer.
+    Returns:
+        ndarray: Value of every column.
+    """
+    labels = np.asarray(labels)
+    start = np.zeros(len(arrays['cost']))
+    start[np.unique(labels) if opened is None else opened] = 1
+    assigned = arrays['pair_warehouse'] == labels[arrays['pair_customer']]
+    pair_values = np.where(assigned, 1.0 if amounts is None else np.asarray(amounts)[arrays['pair_customer']], 0.0)
+    start[arrays['pair_columns']] = pair_values
+    if 'One' in arrays['families']:
+        start[arrays['pair_columns'] + len(pair_values)] = assigned
+    return start
+
+
+def pair_matrix(arrays, values, num_warehouses, num_customers):
+    """
+    Solution values of the (customer, warehouse) pair columns as a (K, N) matrix, 0 for pairs
+    without a column.
+    """
+    flows = np.zeros((num_warehouses, num_customers))
+    flows[arrays['pair_warehouse'], arrays['pair_customer']] = values[arrays['pair_columns']]
+    return flows
+
+
+def to_pulp(arrays, name='CFLP'):
+    """
+    PuLP problem of the model arrays. The expressions are built from the coefficient lists of the
+    CSR rows, instead of the operator overloading of `lpSum`.
+    Returns:
+        tuple: The problem and its variables, in column order.
+    """
+    lp_problem = LpProblem(name, LpMinimize)
+    # Variables owned by the problem where PuLP supports it, which skips its deprecation warning
+    new_variable = getattr(lp_problem, 'add_variable', LpVariable)
+    variables = [new_variable(column, low, None if np.isinf(up) else up, LpBinary if integer else LpContinuous)
+                 for column, low, up, integer in zip(column_names(arrays), arrays['lower'].tolist(),
+                                                     arrays['upper'].tolist(), arrays['integer'].tolist())]
+    cost = arrays['cost']
+    nonzero = np.flatnonzero(cost)
+    lp_problem.setObjective(LpAffineExpression(zip([variables[i] for i in nonzero], cost[nonzero].tolist())))
+
+    matrix = arrays['matrix']
+    indptr, indices, coefficients = matrix.indptr.tolist(), matrix.indices.tolist(), matrix.data.tolist()
+    for row, (lower, upper) in enumerate(zip(arrays['row_lower'].tolist(), arrays['row_upper'].tolist())):
+        start, stop = indptr[row], indptr[row + 1]
+        expression = LpAffineExpression(zip([variables[i] for i in indices[start:stop]], coefficients[start:stop]))
+        if lower == upper:
+            constraint = LpConstraint(expression, LpConstraintEQ, rhs=lower)
+        elif np.isinf(lower):
+            constraint = LpConstraint(expression, LpConstraintLE, rhs=upper)
+        else:
+            constraint = LpConstraint(expression, LpConstraintGE, rhs=lower)
+        lp_problem.addConstraint(constraint)
+    return lp_problem, variables
+
+
+def solve_pulp(arrays, solver, start=None, name='CFLP'):
+    """
+    Solves the model arrays with a PuLP solver, which writes its own model file.
+    Parameters:
+        arrays (dict): Model arrays.
+        solver (LpSolver): PuLP solver, see `pulp_model.get_solver`.
+        start (ndarray): Optional MIP start, see `start_values`.
+    Returns:
+        dict: 'status' and 'solution_status' as PuLP names, 'objective', 'gap' (None, the solver
+        executables do not report it), the 'values' of the columns and the 'load_time' and 'solve_time'
+        in seconds.
+    """
+    with span('pulp.load', path='pulp') as load_span:
+        lp_problem, variables = to_pulp(arrays, name)
+        if start is not None:
+            for variable, initial in zip(variables, start.tolist()):
+                variable.setInitialValue(initial)
+    with span('pulp.solve', solver=type(solver).__name__) as solve_span:
+        lp_problem.solve(solver)
+    count('pulp.solves')
+    return {
+        'status': LpStatus[lp_problem.status],
+        'solution_status': LpSolution[lp_problem.sol_status],
+        'objective': value(lp_problem.objective),
+        'gap': None,
+        'values': np.array([variable.varValue or 0 for variable in variables]),
+        'load_time': load_span['duration'],
+        'solve_time': solve_span['duration'],
+    }
+
+
+def highs_status(model_status, has_solution):
+    """
+    PuLP status and solution status names of a HiGHS model status, as PuLP's own HiGHS solver
+    reports them.
+    """
+    name = str(model_status).split('.')[-1]
+    if name == 'kOptimal':
+        return 'Optimal', 'Optimal Solution Found'
+    if name in ('kInfeasible', 'kUnboundedOrInfeasible'):
+        return 'Infeasible', 'No Solution Exists'
+    if name == 'kUnbounded':
+        return 'Unbounded', 'Solution is Unbounded'
+    if name in ('kObjectiveBound', 'kObjectiveTarget', 'kInterrupt', 'kTimeLimit', 'kIterationLimit') \
+            and has_solution:
+        return 'Optimal', 'Solution Found'
+    return 'Not Solved', 'No Solution Found'
+
+
+def solve_highs(arrays, solver_config, start=None):
+    """
+    Solves the model arrays with HiGHS, passing the CSR matrix, bounds and costs in one call.
+    Parameters:
+        arrays (dict): Model arrays.
+        solver_config (dict): Solver configuration, see `pulp_model.SOLVER_CONFIG`.
+        start (ndarray): Optional MIP start, see `start_values`.
+    Returns:
+        dict: See `solve_pulp`.
+    """
+    import highspy
+
+    with span('pulp.load', path='highspy') as load_span:
+        highs = highspy.Highs()
+        highs.setOptionValue('output_flag', False)
+        for option, key in (('time_limit', 'time_limit'), ('mip_rel_gap', 'gap'), ('threads', 'threads')):
+            if solver_config.get(key) is not None:
+                highs.setOptionValue(option, solver_config[key])
+
+        matrix = arrays['matrix']
+        model = highspy.HighsLp()
+        model.num_col_, model.num_row_ = matrix.shape[1], matrix.shape[0]
+        model.col_cost_ = arrays['cost']
+        model.col_lower_ = arrays['lower']
+        model.col_upper_ = np.minimum(arrays['upper'], highspy.kHighsInf)
+        model.row_lower_ = np.maximum(arrays['row_lower'], -highspy.kHighsInf)
+        model.row_upper_ = np.minimum(arrays['row_upper'], highspy.kHighsInf)
+        model.a_matrix_.format_ = highspy.MatrixFormat.kRowwise
+        model.a_matrix_.start_ = matrix.indptr
+        model.a_matrix_.index_ = matrix.indices
+        model.a_matrix_.value_ = matrix.data
+        model.integrality_ = [highspy.HighsVarType.kInteger if integer else highspy.HighsVarType.kContinuous
+                              for integer in arrays['integer'].tolist()]
+        highs.passModel(model)
+        if start is not None:
+            solution = highspy.HighsSolution()
+            solution.col_value = start
+            highs.setSolution(solution)
+
+    with span('pulp.solve', solver='highspy') as solve_span:
+        highs.run()
+    count('pulp.solves')
+
+    info = highs.getInfo()
+    has_solution = info.primal_solution_status != 0
+    status, solution_status = highs_status(highs.getModelStatus(), has_solution)
+    return {
+        'status': status,
+        'solution_status': solution_status,
+        'objective': highs.getObjectiveValue() if has_solution else None,
+        'gap': float(info.mip_gap) if has_solution else None,
+        'values': np.array(highs.getSolution().col_value) if has_solution else np.zeros(matrix.shape[1]),
+        'load_time': load_span['duration'],
+        'solve_time': solve_span['duration'],
+    }
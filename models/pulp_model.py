@@ -1,49 +1,101 @@
 import numpy as np
 import pandas as pd
-from math import sin, cos, asin, acos, radians
-from pulp import LpProblem, LpMinimize, LpVariable, LpBinary, lpSum, LpStatus, value
+from pulp import PULP_CBC_CMD, HiGHS_CMD, GLPK_CMD, listSolvers
 import matplotlib.pyplot as plt
+from models.candidates import CANDIDATE_FACTOR, candidate_sites
+from models.matrix_model import cardinality_rows, full_arrays, sparse_arrays, start_values, pair_matrix
+from models.matrix_model import solve_highs, solve_pulp
+from profiling.trace import count, span
+from spatial.distance import cost_matrix
+from spatial.index import SpatialIndex
 plt.style.use('ggplot')
 
+# Setup cost of a warehouse
+SETUP_COST = 10**5
 
-def get_pulp(df, num_clusters):
+# Number of nearest candidate warehouses each customer can be linked to in the sparse formulation,
+# per warehouse to open when there are more candidates than warehouses
+K_NEAREST = 3
+
+# Default MILP solver configuration: no time limit, default gap and threads, no MIP start
+SOLVER_CONFIG = {
+    'backend': 'CBC',
+    'time_limit': None,
+    'gap': None,
+    'threads': None,
+    'warm_start': False,
+}
+
+# Solution statuses of a solve that returned an incumbent, optimal or not
+INCUMBENT_STATUSES = ('Optimal Solution Found', 'Solution Found')
+
+# PuLP solver classes that can run each backend
+SOLVER_BACKENDS = {
+    'CBC': ['PULP_CBC_CMD'],
+    'HiGHS': ['HiGHS', 'HiGHS_CMD'],
+    'GLPK': ['GLPK_CMD'],
+}
+
+
+def get_pulp(df, num_clusters, dtype=np.float64, formulation='full', k_nearest=K_NEAREST,
+             single_sourcing=False, compare_full=False, solver_config=None, previous_solution=None, report=None,
+             candidate_method='kmeans++', candidate_factor=CANDIDATE_FACTOR):
     """
     Executes the Pulp algorithm.
     Parameters:
         df (DataFrame): Preprocessed DataFrame.
         num_clusters (int): Number of clusters.
+        dtype: Precision of the transport cost matrix (np.float32 or np.float64).
+        formulation, k_nearest, single_sourcing, compare_full, solver_config, previous_solution, report,
+        candidate_method, candidate_factor: See `process_data`.
     Returns:
         tuple: Tuple containing the updated DataFrame, cluster labels and centroid centers.
     """
-    return process_data(df, num_clusters)
+    return process_data(df, num_clusters, dtype=dtype, formulation=formulation, k_nearest=k_nearest,
+                        single_sourcing=single_sourcing, compare_full=compare_full,
+                        solver_config=solver_config, previous_solution=previous_solution, report=report,
+                        candidate_method=candidate_method, candidate_factor=candidate_factor)
 
 
-def process_data(df, num_clusters):
+def process_data(df, num_clusters, dtype=np.float64, formulation='full', k_nearest=K_NEAREST,
+                 single_sourcing=False, compare_full=False, solver_config=None, previous_solution=None,
+                 report=None, candidate_method='kmeans++', candidate_factor=CANDIDATE_FACTOR):
     """
     Use the Pulp model checker to find the solution.
     Parameters:
         df (DataFrame): Preprocessed DataFrame.
         n_warehouses (int): Number of warehouses (clusters).
+        dtype: Precision of the transport cost matrix (np.float32 or np.float64).
+        formulation (str): 'full' links every customer to every warehouse, 'sparse' only to
+            its `k_nearest` candidate warehouses.
+        k_nearest (int): Number of candidate warehouses per customer in the sparse formulation, scaled
+            by the number of candidates per warehouse.
+        single_sourcing (bool): Make the sparse assignment variables binary.
+        compare_full (bool): Also solve the full model to measure the objective change of the sparse one.
+        solver_config (dict): Overrides of `SOLVER_CONFIG` (backend, time_limit in seconds,
+            relative gap, threads and warm_start).
+        previous_solution (tuple): Labels and centroids of an earlier run on the same customers,
+            possibly with another number of warehouses, turned into a MIP start.
+        report (dict): Optional dictionary filled with the model size, objective, solve figures, whether
+            the solver returned a solution ('solved', the greedy `select_sites` stands in otherwise) and the
+            distance, build (model arrays), load (hand-off to the solver), solve and repair timings in seconds.
+        candidate_method (str): Strategy generating the candidate sites, see `models.candidates`.
+        candidate_factor (float): Candidate sites per warehouse, the model opens `num_clusters` of them.
     Returns:
-        tuple: Tuple containing the updated DataFrame, cluster labels and warehouse locations.
+        tuple: Tuple containing the updated DataFrame, cluster labels and locations of the opened warehouses.
     """ 
 
-    #Dictionary of customer and demand
-    demand_dict = {customer: df['Demand'][i]
-                   for i, customer in enumerate(df.index)}
-    
-    #Mention random state so that the warehouses are not chosen differently every time for the same no. of clusters
-    RANDOM_STATE = 2
-    
-    #Table representing location of warehouses
-    new_df = df.sample(n=num_clusters, random_state=RANDOM_STATE) #faculty_df
+    #Table representing location of the candidate warehouses, the same for the same no. of clusters
+    with span('pulp.candidates', method=candidate_method):
+        new_df = df.iloc[candidate_sites(df, num_clusters, candidate_method, candidate_factor)] #faculty_df
     new_df = new_df.reset_index()
+    count('pulp.customers', df.shape[0])
+    count('pulp.candidates', new_df.shape[0])
     
     #Table representing the customer locations same as the original dataframe
     customer_df = df
     
-    #Specify the setup cost and the supply per warehouse
-    SETUP_COST = 10**5
+    #Specify the supply per warehouse
     SUPPLY_PER_WAREHOUSE = df['Demand'].sum() / num_clusters    #capacity of warehouses
     SUPPLY_PER_WAREHOUSE += 0.1 * SUPPLY_PER_WAREHOUSE
     
@@ -51,216 +103,280 @@ def process_data(df, num_clusters):
     new_df['warehouse_id'] = ['Warehouse' +
                               str(i) for i in range(0, new_df.shape[0])]
     
-    #Dictionary of supply and setup cost for each warehouse
-    annual_supply_dict = {
-        warehouse: SUPPLY_PER_WAREHOUSE for warehouse in new_df['warehouse_id']}
-    annual_cost_dict = {
-        warehouse: SETUP_COST for warehouse in new_df['warehouse_id']}
-    
-    #Dictionary representing transport cost from every warehouse to every customer
-    transport_costs_dict = {}
-    for i in range(new_df.shape[0]):
-        warehouse_transport_costs_dict = {}
-        for j in customer_df.index:
-            if new_df['lat'].iloc[i] == customer_df.loc[j, 'lat'] and new_df['lng'].iloc[i] == customer_df.loc[j, 'lng']:
-                d = 0
-            else:
-                d = haversine_distance(
-                    new_df['lat'].iloc[i], new_df['lng'].iloc[i], customer_df.loc[j, 'lat'], customer_df.loc[j, 'lng'])
-            warehouse_transport_costs_dict.update({j: travelling_cost(d)})
-        transport_costs_dict.update(
-            {new_df['warehouse_id'].iloc[i]: warehouse_transport_costs_dict})
-    # Note that wherever you used customer_df.index[j] or customer_df['customer_id'][j], you just need to use customer_df.index[j]
-    
-    #Inititalize the problem
-    lp_problem = LpProblem('CFLP', LpMinimize) #capacitated facility location problem
-    
-    #Variable representing whether facility has to be created or not
-    created_facility = LpVariable.dicts(
-        'Create_facility', new_df['warehouse_id'], 0, 1, LpBinary)
-    
-    #Variable representing no. of units being served
-    served_customer = LpVariable.dicts('Link', [(
-        i, j) for i in customer_df.index for j in new_df['warehouse_id']], 0)
-    
-    #Binary Variable describing whether i customer has been allocated to j warehouse
-    bin = LpVariable.dicts('One', [(i, j) for i in customer_df.index
-                           for j in new_df['warehouse_id']], 0, 1, LpBinary)
-    
-    #Specify the objective
-    objective = lpSum(annual_cost_dict[j]*created_facility[j] for j in new_df['warehouse_id']) +\
-        lpSum(transport_costs_dict[j][i]*served_customer[(i, j)]
-              for j in new_df['warehouse_id'] for i in customer_df.index)
-    
-    #Add the objective to the problem
-    lp_problem += objective
-
-    # One User One Inventory
-    for i in customer_df.index:
-        lp_problem += lpSum(bin[(i, j)] for j in new_df['warehouse_id']) == 1
-
-    # Demand Constraint
-    for i in customer_df.index:
-        lp_problem += lpSum(served_customer[(i, j)]
-                            for j in new_df['warehouse_id']) == demand_dict[i]
-
-    # Capacity Constraint
-    for j in new_df['warehouse_id']:
-        lp_problem += lpSum(served_customer[(i, j)] for i in customer_df.index
-                            ) <= annual_supply_dict[j]*created_facility[j]
-
-    #Solve the problem   
-    lp_problem.solve()
-
-    #Dictionary reprenting whcih customers have been assigned to which warehouse
-    assigned_customers = {warehouse: []
-                          for warehouse in new_df['warehouse_id']}
-    for (customer, warehouse), variable in served_customer.items():
-        if variable.varValue > 0:
-            assigned_customers[warehouse].append(customer)
-    
-    
-    # Calculate total demand for each warehouse
-    total_demand_dict = {warehouse: sum(
-        demand_dict[customer] for customer in assigned_customers[warehouse]) for warehouse in assigned_customers}
-    
-    for warehouse, customers in assigned_customers.items():
-        assigned_customers[warehouse] = list(set(customers))
-
-    # Check if any customer is assigned to multiple warehouses
-    duplicate_customers = []
-    for customer in customer_df.index:
-        assigned_to_warehouses = []
-        for warehouse, customers in assigned_customers.items():
-            if customer in customers:
-                assigned_to_warehouses.append(warehouse)
-        if len(assigned_to_warehouses) > 1:
-            duplicate_customers.append(customer)
-
-    # Remove duplicate assignments by keeping the customer assigned to only one warehouse
-    for customer in duplicate_customers:
-        warehouses = []
-        for warehouse, customers in assigned_customers.items():
-            if customer in customers:
-                warehouses.append(warehouse)
-        # Keep the customer assigned to the first warehouse and remove from the others
-        for warehouse in warehouses[1:]:
-            assigned_customers[warehouse].remove(customer)
-            total_demand_dict[warehouse] -= demand_dict[customer]
-    
-    var_continue = 0
-    # Iterate over warehouses to check and reassign if needed
-    while any(total_demand > annual_supply_dict[warehouse] for warehouse, total_demand in total_demand_dict.items()):
-        # Iterate over warehouses
-        for warehouse in assigned_customers:
-            if total_demand_dict[warehouse] > annual_supply_dict[warehouse]:
-                # Sort assigned customers by demand in descending order
-                try:
-                    assigned_customers[warehouse].sort(
-                        key=lambda customer: transportation_cost(customer, warehouse, customer_df, new_df), reverse=True)
-                except:
-                    var_continue += 1
-                # Reassign customers until capacity is not exceeded or no more reassignments are possible
-                while total_demand_dict[warehouse] > annual_supply_dict[warehouse]:
-                    reassigned = False
-
-                    # Remove customer with highest demand from the current warehouse
-                    customer_to_reassign = assigned_customers[warehouse].pop(0)
-                    total_demand_dict[warehouse] -= demand_dict[customer_to_reassign]
-
-                    # Find the closest warehouse with available capacity
-                    closest_warehouse = None
-                    min_distance = float('inf')
-                    for other_warehouse in assigned_customers:
-                        if total_demand_dict[other_warehouse] + demand_dict[customer_to_reassign] <= annual_supply_dict[other_warehouse]:
-                            distance = haversine_distance(customer_df.loc[customer_to_reassign, 'lat'],
-                                                          customer_df.loc[customer_to_reassign, 'lng'],
-                                                          new_df.loc[new_df['warehouse_id']
-                                                                     == other_warehouse, 'lat'],
-                                                          new_df.loc[new_df['warehouse_id'] == other_warehouse, 'lng'])
-
-                            if distance < min_distance:
-                                min_distance = distance
-                                closest_warehouse = other_warehouse
-
-                    # Reassign the customer to the closest warehouse
-                    if closest_warehouse is not None:
-                        assigned_customers[closest_warehouse].append(
-                            customer_to_reassign)
-                        total_demand_dict[closest_warehouse] += demand_dict[customer_to_reassign]
-                        reassigned = True
-
-                    # Break the loop if no more reassignments are possible
-                    if not reassigned:
-                        break    
-    
-    #Array in which index is representing customer and the value at a particular index is warehouse id
-    labels = []
-    for i in range(len(customer_df)):
-        labels.append(0)
-
-    count = 0
-    for warehouse in list(assigned_customers.keys()):
-        for j in assigned_customers[warehouse]:
-            labels[j] = count
-        count += 1
-
-       
-    #Convert labels to numpy array and add it as a cluster column in df
-    labels = np.asarray(labels)
-    demand = df['Demand'].to_numpy()
-    coordinates = df[['lat', 'lng']].to_numpy()
-    centroids = new_df[['lat', 'lng']].to_numpy()
+    #Matrix of transport cost from every warehouse (rows) to every customer (columns)
+    with span('pulp.distance') as distance_span:
+        transport_costs = cost_matrix(new_df, customer_df, dtype=dtype)
+
+    #Demand per customer, supply and setup cost per warehouse
+    demand = customer_df['Demand'].to_numpy(dtype=float)
+    supply = np.full(new_df.shape[0], SUPPLY_PER_WAREHOUSE, dtype=float)
+    setup_cost = np.full(new_df.shape[0], SETUP_COST, dtype=float)
+    lat, lng = customer_df['lat'].to_numpy(dtype=float), customer_df['lng'].to_numpy(dtype=float)
+
+    #Great-circle index of the candidate warehouses, shared by the candidate lists, the warm start and the repair
+    warehouse_index = SpatialIndex.from_frame(new_df)
+
+    #Assignment derived from a previous solution, passed to the solver as a MIP start
+    solver_config = {**SOLVER_CONFIG, **(solver_config or {})}
+    start_labels = start_sites = None
+    if previous_solution is not None and len(previous_solution[0]) == customer_df.shape[0]:
+        start_labels, start_sites = warm_start_labels(warehouse_index, previous_solution, transport_costs, demand,
+                                                      supply, num_clusters, lat, lng)
+        solver_config['warm_start'] = True
+
+    #Build the full or the candidate-pruned formulation as sparse arrays, then solve it
+    model_args = (transport_costs, demand, supply, setup_cost, num_clusters)
+    if formulation == 'sparse':
+        # Only one candidate in M/K is opened, so every customer keeps k_nearest per warehouse to open
+        k_nearest = min(k_nearest * int(np.ceil(new_df.shape[0] / num_clusters)), new_df.shape[0])
+        while True:
+            with span('pulp.build', formulation=formulation, k_nearest=int(k_nearest)) as build_span:
+                candidates = nearest_candidates(customer_df, warehouse_index, k_nearest)
+                arrays = sparse_arrays(*model_args[:4], candidates, num_clusters, single_sourcing)
+                start = start_values(arrays, start_labels, opened=start_sites) if start_labels is not None else None
+            solution = solve_model(arrays, solver_config, start, 'CFLP_sparse')
+            # The nearest sites alone can lack the capacity for a region, widen the candidate lists then
+            if solution['status'] != 'Infeasible' or k_nearest >= new_df.shape[0]:
+                break
+            k_nearest = min(2 * k_nearest, new_df.shape[0])
+    else:
+        with span('pulp.build', formulation=formulation) as build_span:
+            arrays = full_arrays(*model_args)
+            start = start_values(arrays, start_labels, demand, start_sites) if start_labels is not None else None
+        solution = solve_model(arrays, solver_config, start)
+    num_constraints, num_variables = arrays['matrix'].shape
+    count('pulp.variables', num_variables)
+    count('pulp.constraints', num_constraints)
+
+    if report is not None:
+        n_customers, n_warehouses = customer_df.shape[0], new_df.shape[0]
+        report.update({
+            'formulation': formulation,
+            'backend': solver_config['backend'],
+            'solver_path': solution['path'],
+            'status': solution['status'],
+            'solution_status': solution['solution_status'],
+            'distance_time': distance_span['duration'],
+            'build_time': build_span['duration'],
+            'load_time': solution['load_time'],
+            'solve_time': solution['solve_time'],
+            'gap_limit': solver_config['gap'],
+            'gap': solution['gap'],
+            'warm_started': start_labels is not None,
+            'objective': solution['objective'],
+            'variables': num_variables,
+            'constraints': num_constraints,
+            'nonzeros': int(arrays['matrix'].nnz),
+            'full_variables': n_warehouses + 2 * n_customers * n_warehouses,
+            'full_constraints': 2 * n_customers + n_warehouses + len(cardinality_rows(n_warehouses, num_clusters)),
+            'candidate_method': candidate_method,
+            'candidates': n_warehouses,
+            'solved': solution['solution_status'] in INCUMBENT_STATUSES,
+        })
+        report['size_reduction'] = 1 - report['variables'] / report['full_variables']
+        if formulation == 'sparse':
+            report['k_nearest'] = int(k_nearest)
+            if compare_full:
+                full_solution = solve_model(full_arrays(*model_args), solver_config)
+                report['objective_full'] = full_solution['objective']
+                report['objective_change'] = (
+                    report['objective'] - report['objective_full']) / report['objective_full']
+
+    #Without an incumbent (e.g. a time limit reached before the first feasible solution) the solver
+    #values mean nothing, the warehouses are then picked by the greedy heuristic of `select_sites`
+    #and every customer starts at its cheapest one
+    if solution['solution_status'] in INCUMBENT_STATUSES:
+        #Units or shares served by every warehouse (rows) to every customer (columns), read from the solution
+        with span('pulp.extract'):
+            flows = pair_matrix(arrays, solution['values'], new_df.shape[0], customer_df.shape[0])
+        opened = solution['values'][:new_df.shape[0]] > 0.5
+        cheapest = np.flatnonzero(opened)[np.argmin(transport_costs[opened], axis=0)]
+        #Customers without flow, e.g. without demand, go to their cheapest opened warehouse
+        primary = np.where(flows.sum(axis=0) > 0, np.argmax(flows, axis=0), cheapest)
+    else:
+        with span('pulp.fallback', status=solution['status']):
+            opened = np.zeros(new_df.shape[0], dtype=bool)
+            opened[select_sites(transport_costs, demand, num_clusters)] = True
+            primary = np.flatnonzero(opened)[np.argmin(transport_costs[opened], axis=0)]
+
+    #Every customer is kept by the warehouse serving the largest part of its demand, then
+    #customers are moved out of over-capacity warehouses into other opened ones
+    with span('pulp.repair') as repair_span:
+        labels = repair_capacity(primary, demand, np.where(opened, supply, 0), warehouse_index, lat, lng)
+    count('pulp.repair_moves', int((labels != primary).sum()))
+
+    #Renumber the opened warehouses and add the labels as a cluster column in df
+    labels = (np.cumsum(opened) - 1)[labels]
+    centroids = new_df.loc[opened, ['lat', 'lng']].to_numpy()
     df['Cluster'] = labels
+    if report is not None:
+        report['opened'] = int(opened.sum())
+        report['repair_time'] = repair_span['duration']
     
     #Return parameters
     return df, labels, centroids
 
-#Calculate Haversine distance between two locations
-def haversine_distance(lat1, lon1, lat2, lon2):
-    return 6371.01 *\
-        acos(sin(radians(lat1))*sin(radians(lat2)) +
-             cos(radians(lat1))*cos(radians(lat2))*cos(radians(lon1)-radians(lon2)))
-
-#Calculate Travelling cost when distance is passed as parameter
-def travelling_cost(distance):
-    petrol_price = 1.87
-    mileage = 0.38
-    return petrol_price*mileage*distance
-
-#Returns the customer and the warehouse through which it is being served
-def get_linked_customers(input_warehouse, served_customer):
-    # Initialize empty list
-    linked_customers = []
-
-    # Iterate through the xij decision variable
-    for (k, v) in served_customer.items():
-
-        # Filter the input warehouse and positive variable values
-        if k[1] == input_warehouse and v.varValue > 0:
-
-            # Customer is served by the input warehouse
-            linked_customers.append(k[0])
-
-    return linked_customers
-
-#Returns the transportation cost . Either this or travelling_cost can be used
-def transportation_cost(customer, warehouse, customer_df, new_df):
-    # Retrieve the latitude and longitude of the customer and warehouse
-    customer_lat = customer_df.loc[customer_df['customer_id']
-                                   == customer, 'lat'].values[0]
-    customer_lng = customer_df.loc[customer_df['customer_id']
-                                   == customer, 'lng'].values[0]
-    warehouse_lat = new_df.loc[new_df['warehouse_id']
-                               == warehouse, 'lat'].values[0]
-    warehouse_lng = new_df.loc[new_df['warehouse_id']
-                               == warehouse, 'lng'].values[0]
-
-    # Calculate the haversine distance between the customer and warehouse
-    distance = haversine_distance(
-        customer_lat, customer_lng, warehouse_lat, warehouse_lng)
-
-    # You can replace this with your actual cost calculation formula
-    cost = distance * 10  # Assuming a cost of $10 per kilometer
-
-    return cost
\ No newline at end of file
+
+def available_backends():
+    """
+    Returns:
+        list: Solver backends of `SOLVER_BACKENDS` installed on this machine.
+    """
+    installed = listSolvers(onlyAvailable=True)
+    return [backend for backend, solvers in SOLVER_BACKENDS.items()
+            if any(solver in installed for solver in solvers)]
+
+
+def get_solver(solver_config=None):
+    """
+    Build a quiet PuLP solver from a solver configuration.
+    Parameters:
+        solver_config (dict): Overrides of `SOLVER_CONFIG`.
+    Returns:
+        LpSolver: Solver honouring the time limit, relative gap, threads and warm start.
+    """
+    config = {**SOLVER_CONFIG, **(solver_config or {})}
+    backend = config['backend']
+    if backend not in SOLVER_BACKENDS:
+        raise ValueError(f"Unknown solver backend '{backend}', expected one of {list(SOLVER_BACKENDS)}")
+
+    if backend == 'GLPK':
+        options = ['--mipgap', str(config['gap'])] if config['gap'] is not None else None
+        return GLPK_CMD(msg=False, timeLimit=config['time_limit'], options=options)
+
+    options = dict(msg=False, timeLimit=config['time_limit'], gapRel=config['gap'], threads=config['threads'])
+    if backend == 'HiGHS':
+        # With highspy installed `solve_model` hands HiGHS the arrays directly, this is the executable fallback
+        return HiGHS_CMD(warmStart=config['warm_start'], **options)
+    return PULP_CBC_CMD(warmStart=config['warm_start'], **options)
+
+
+def solve_model(arrays, solver_config=None, start=None, name='CFLP'):
+    """
+    Solve model arrays with the configured backend: HiGHS receives them through its array API
+    when highspy is installed, the other backends through a PuLP problem.
+    Parameters:
+        arrays (dict): Model arrays, see `models.matrix_model`.
+        solver_config (dict): Overrides of `SOLVER_CONFIG`.
+        start (ndarray): Optional MIP start, see `models.matrix_model.start_values`.
+        name (str): Name of the PuLP problem.
+    Returns:
+        dict: Solution of `models.matrix_model.solve_pulp`, with the 'path' it took.
+    """
+    config = {**SOLVER_CONFIG, **(solver_config or {})}
+    if config['backend'] == 'HiGHS' and 'HiGHS' in listSolvers(onlyAvailable=True):
+        return dict(solve_highs(arrays, config, start), path='highspy')
+    return dict(solve_pulp(arrays, get_solver(config), start, name), path='pulp')
+
+
+def nearest_candidates(customer_df, index, k_nearest):
+    """
+    Positions of the k nearest warehouses of every customer, by great-circle distance.
+    Returns:
+        ndarray: (N, k) array of warehouse positions in the index.
+    """
+    _, candidates = index.knn(customer_df['lat'], customer_df['lng'], k_nearest)
+    return candidates
+
+def repair_capacity(labels, demand, capacity, index, lat, lng):
+    """
+    Move customers out of over-capacity warehouses. Customers of overloaded warehouses are moved,
+    farthest first, to the nearest warehouse that still has room for their demand; customers that
+    fit nowhere stay where they are. Every round looks up the targets of all the customers to move
+    with one nearest-with-capacity query, customers whose target filled up in the meantime are
+    looked up again in the next round.
+    Parameters:
+        labels (ndarray): Warehouse position of every customer.
+        demand (ndarray): Demand of every customer.
+        capacity (ndarray): Capacity of every warehouse.
+        index (SpatialIndex): Index of the warehouses.
+        lat, lng (ndarray): Coordinates of the customers.
+    Returns:
+        ndarray: Repaired warehouse position of every customer.
+    """
+    labels = np.array(labels, dtype=int)
+    load = np.bincount(labels, weights=demand, minlength=len(capacity))
+
+    while True:
+        moving = np.flatnonzero(load[labels] > capacity[labels])
+        if not moving.size:
+            break
+        moving = moving[np.argsort(-index.distances(labels[moving], lat[moving], lng[moving]), kind='stable')]
+        targets = index.nearest_with_capacity(lat[moving], lng[moving], demand[moving], capacity - load,
+                                              exclude=labels[moving])
+
+        moved = False
+        for customer, target in zip(moving, targets):
+            warehouse = labels[customer]
+            if target < 0 or load[warehouse] <= capacity[warehouse] or \
+                    capacity[target] - load[target] < demand[customer]:
+                continue
+            labels[customer] = target
+            load[warehouse] -= demand[customer]
+            load[target] += demand[customer]
+            moved = True
+        if not moved:
+            break
+
+    return labels
+
+
+def select_sites(transport_costs, demand, num_open, sites=()):
+    """
+    Greedy choice of exactly `num_open` warehouses by demand-weighted transport cost, every customer
+    being served by its cheapest chosen warehouse. Starting from `sites`, the warehouse whose removal
+    raises the cost the least is dropped while there are too many, and the one lowering it the most
+    is added while there are too few.
+    Parameters:
+        transport_costs (ndarray): (M, N) transport cost matrix.
+        demand (ndarray): Demand of every customer.
+        num_open (int): Number of warehouses to choose, at most M.
+        sites (array-like): Warehouse positions to start from.
+    Returns:
+        ndarray: Sorted positions of the chosen warehouses.
+    """
+    num_open = min(num_open, transport_costs.shape[0])
+    sites = np.unique(sites).tolist()
+
+    def total_cost(chosen):
+        return demand @ transport_costs[chosen].min(axis=0)
+
+    while len(sites) > num_open:
+        sites.pop(int(np.argmin([total_cost(sites[:i] + sites[i + 1:]) for i in range(len(sites))])))
+    while len(sites) < num_open:
+        cheapest = transport_costs[sites].min(axis=0) if sites else np.inf
+        totals = np.minimum(transport_costs, cheapest) @ demand
+        totals[sites] = np.inf
+        sites.append(int(np.argmin(totals)))
+    return np.sort(sites)
+
+
+def warm_start_labels(index, previous_solution, transport_costs, demand, supply, num_open, lat, lng):
+    """
+    Initial assignment on exactly `num_open` warehouses built from a previous solution: every previous
+    warehouse is mapped to the nearest current warehouse, `select_sites` drops or adds warehouses by
+    cost until there are `num_open` of them, customers follow their warehouse unless it was dropped or
+    an added one is cheaper, and the capacity repair among the chosen warehouses makes the assignment feasible.
+    Parameters:
+        index (SpatialIndex): Index of the current warehouses.
+        previous_solution (tuple): Previous labels and centroids.
+        transport_costs (ndarray): (M, N) transport cost matrix of the current warehouses.
+        demand (ndarray): Demand of every customer.
+        supply (ndarray): Capacity of every current warehouse.
+        num_open (int): Number of warehouses the model opens.
+        lat, lng (ndarray): Coordinates of the customers.
+    Returns:
+        tuple: Warehouse position of every customer and sorted positions of the opened warehouses.
+    """
+    previous_labels, previous_centroids = previous_solution
+    previous_centroids = np.asarray(previous_centroids)[:, :2]
+    _, nearest = index.knn(previous_centroids[:, 0], previous_centroids[:, 1], 1)
+    labels = nearest[:, 0][np.asarray(previous_labels)]
+    sites = select_sites(transport_costs, demand, num_open, labels)
+
+    cheapest = sites[np.argmin(transport_costs[sites], axis=0)]
+    moving = ~np.isin(labels, sites) | ~np.isin(cheapest, labels)
+    labels[moving] = cheapest[moving]
+    opened = np.zeros(len(supply), dtype=bool)
+    opened[sites] = True
+    return repair_capacity(labels, demand, np.where(opened, supply, 0), index, lat, lng), sites
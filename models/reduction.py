@@ -0,0 +1,186 @@
+import numpy as np
+import pandas as pd
+from sklearn.cluster import MiniBatchKMeans
+from metrics.clusters import CAPACITY_MARGIN, evaluate_solution
+from models.kmeans import RANDOM_STATE
+from profiling.trace import count, span
+from spatial.distance import haversine_array, travelling_cost
+from spatial.grid import grid_cells, weighted_centres
+from spatial.projection import project
+
+# Demand-weighted super-points the customers are reduced to before solving
+REDUCED_POINTS = 2000
+
+# Largest demand of a super-point, as a share of the capacity of a warehouse: heavier ones could
+# not be split between warehouses and would overload them, so they are cut into lighter pieces
+SPLIT_SHARE = 0.2
+
+
+def grid_reduction(df, max_points, random_state=RANDOM_STATE):
+    """
+    Customers binned into the latitude/longitude grid cells of `spatial.grid.grid_cells`.
+    Returns:
+        ndarray: Super-point of every customer.
+    """
+    return grid_cells(df['lat'], df['lng'], max_points)[0]
+
+
+def microcluster_reduction(df, max_points, random_state=RANDOM_STATE):
+    """
+    Customers grouped into demand-weighted mini-batch K-Means micro-clusters on the sphere, which
+    follow the density of the customers instead of a fixed grid, at several times the cost.
+    Returns:
+        ndarray: Super-point of every customer.
+    """
+    points = project(df['lat'], df['lng'], 'sphere')
+    microclusters = MiniBatchKMeans(n_clusters=max_points, n_init=1, random_state=random_state)
+    labels = microclusters.fit_predict(points, sample_weight=df['Demand'].to_numpy(dtype=float))
+    # Empty micro-clusters are dropped so the super-points are numbered without gaps
+    return np.unique(labels, return_inverse=True)[1]
+
+
+# Strategies binning the customers, called with the customers, the number of super-points and a seed
+REDUCTION_METHODS = {
+    'grid': grid_reduction,
+    'microcluster': microcluster_reduction,
+}
+
+
+def split_heavy(assignment, lng, demand, max_demand):
+    """
+    Cuts the super-points heavier than `max_demand` into west-to-east pieces of at most about
+    `max_demand` each. A single customer heavier than that stays one piece.
+    Returns:
+        ndarray: Super-point of every customer, numbered from 0 without gaps.
+    """
+    order = np.lexsort((lng, assignment))
+    cumulative = np.cumsum(demand[order])
+    # Demand accumulated before every customer inside its own super-point
+    starts = np.searchsorted(assignment[order], np.arange(assignment.max() + 1))
+    before = cumulative - demand[order] - np.concatenate([[0], cumulative])[starts][assignment[order]]
+    pieces = np.empty(len(assignment), dtype=np.int64)
+    pieces[order] = np.floor(before / max_demand)
+    return np.unique(assignment.astype(np.int64) * (pieces.max() + 1) + pieces, return_inverse=True)[1]
+
+
+def reduce_customers(df, max_points=REDUCED_POINTS, method='grid', random_state=RANDOM_STATE, max_demand=None):
+    """
+    Reduces the customers to at most `max_points` super-points, each at the demand-weighted centre
+    of its customers and carrying their total demand.
+    Parameters:
+        df (DataFrame): Preprocessed customers with lat, lng and Demand columns.
+        max_points (int): Maximum number of super-points, exceeded by the pieces of heavy ones.
+        method (str): Key of `REDUCTION_METHODS`.
+        random_state (int): Seed of the micro-clusters.
+        max_demand (float): Demand above which a super-point is cut, see `split_heavy`.
+    Returns:
+        tuple: Super-points with lat, lng, Demand and customers columns (plus the summed population
+        when there is one), and the super-point position of every customer. Below `max_points`
+        customers they are returned unchanged.
+    """
+    if len(df) <= max_points:
+        return df, np.arange(len(df))
+    if method not in REDUCTION_METHODS:
+        raise ValueError(f"Unknown reduction method '{method}', expected one of {list(REDUCTION_METHODS)}")
+
+    with span('reduction.bin', method=method, customers=len(df)):
+        assignment = REDUCTION_METHODS[method](df, max_points, random_state)
+    demand = df['Demand'].to_numpy(dtype=float)
+    if max_demand:
+        assignment = split_heavy(assignment, df['lng'].to_numpy(dtype=float), demand, max_demand)
+    lat, lng = weighted_centres(assignment, df['lat'], df['lng'], demand)
+    reduced = pd.DataFrame({
+        'lat': lat,
+        'lng': lng,
+        'Demand': np.bincount(assignment, weights=demand),
+        'customers': np.bincount(assignment),
+    })
+    if 'population' in df:
+        reduced['population'] = np.bincount(assignment, weights=df['population'].fillna(0).to_numpy(dtype=float))
+    count('reduction.points', len(reduced))
+    return reduced, assignment
+
+
+def reduce_labels(labels, assignment, demand, num_points):
+    """
+    Label of every super-point from the labels of its customers: the label carrying most of their demand.
+    Parameters:
+        labels (array-like): Label of every customer, e.g. of a previous solution.
+        assignment (ndarray): Super-point of every customer.
+        demand (ndarray): Demand of every customer.
+        num_points (int): Number of super-points.
+    Returns:
+        ndarray: Label of every super-point.
+    """
+    labels = np.asarray(labels, dtype=np.int64)
+    num_labels = labels.max() + 1
+    votes = np.bincount(assignment * num_labels + labels, weights=demand, minlength=num_points * num_labels)
+    return votes.reshape(num_points, num_labels).argmax(axis=1)
+
+
+def solve_reduced(model, df, num_clusters, params=None, max_points=REDUCED_POINTS, method='grid',
+                  compare_full=False, report=None):
+    """
+    Solves a model on the super-points of `reduce_customers` and projects the labels back to the
+    customers, which follow their super-point. Cluster loads are unchanged by the projection, as
+    a super-point carries the demand of its customers, and super-points are kept lighter than
+    `SPLIT_SHARE` of a warehouse so the models can still balance the loads. A previous solution of
+    the customers, given as a warm start, is carried over to the super-points by `reduce_labels`.
+    Parameters:
+        model (function): Model function of `MODELS_TYPES`.
+        df (DataFrame): Preprocessed customers.
+        num_clusters (int): Number of clusters.
+        params (dict): Extra keyword arguments of the model.
+        max_points, method: See `reduce_customers`.
+        compare_full (bool): Also solve the customers at full resolution, to measure the cost change.
+        report (dict): Optional dictionary filled with the reduction figures and transport costs:
+            'reduced_cost' as seen by the model on the super-points, 'projected_cost' of the
+            customers with the projected labels and 'aggregation_bound', the demand-weighted cost
+            of moving every customer to its super-point, which bounds their difference.
+    Returns:
+        tuple: Tuple containing the updated DataFrame, cluster labels and centroid centers.
+    """
+    params = params or {}
+    with span('reduction', method=method) as reduction_span:
+        capacity = df['Demand'].sum() / num_clusters * (1 + CAPACITY_MARGIN)
+        reduced, assignment = reduce_customers(df, max_points, method, max_demand=SPLIT_SHARE * capacity)
+    model_params = params
+    previous_solution = params.get('previous_solution')
+    if previous_solution is not None and len(previous_solution[0]) == len(df):
+        previous_labels = reduce_labels(previous_solution[0], assignment, df['Demand'].to_numpy(dtype=float),
+                                        len(reduced))
+        model_params = dict(params, previous_solution=(previous_labels, previous_solution[1]))
+    with span('reduction.model', points=len(reduced)) as model_span:
+        _, point_labels, centroids = model(reduced.copy(), num_clusters, **model_params)
+    labels = np.asarray(point_labels)[assignment]
+    df['Cluster'] = labels
+
+    if report is not None:
+        demand = df['Demand'].to_numpy(dtype=float)
+        moved = haversine_array(df['lat'], df['lng'], reduced['lat'].to_numpy()[assignment],
+                                reduced['lng'].to_numpy()[assignment])
+        reduced_cost = evaluate_solution(reduced, point_labels, centroids)[0]
+        projected_cost = evaluate_solution(df, labels, centroids)[0]
+        report.update({
+            'method': method,
+            'customers': len(df),
+            'super_points': len(reduced),
+            'reduction_time': reduction_span['duration'],
+            'model_time': model_span['duration'],
+            'reduced_cost': reduced_cost,
+            'projected_cost': projected_cost,
+            'cost_change': projected_cost / reduced_cost - 1 if reduced_cost else 0.0,
+            'aggregation_bound': float((travelling_cost(moved) * demand).sum()),
+            'max_move_km': float(moved.max()),
+        })
+        if compare_full:
+            full_params = {key: value for key, value in params.items() if key != 'report'}
+            with span('reduction.full_model') as full_span:
+                _, full_labels, full_centroids = model(df.copy(), num_clusters, **full_params)
+            full_cost = evaluate_solution(df, full_labels, full_centroids)[0]
+            report.update({
+                'full_time': full_span['duration'],
+                'full_cost': full_cost,
+                'cost_change_vs_full': projected_cost / full_cost - 1 if full_cost else 0.0,
+            })
+    return df, labels, centroids
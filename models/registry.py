@@ -0,0 +1,9 @@
+from models import kmeans, pulp_model, capacitated
+
+# Model functions by display name, called with the preprocessed customers, the number of
+# warehouses and the model keyword arguments; they return the DataFrame, labels and centroids
+MODELS_TYPES = {
+    'K-Means': kmeans.get_kmeans,
+    'Pulp': pulp_model.get_pulp,
+    'Capacitated K-Means': capacitated.get_capacitated
+}
@@ -0,0 +1,151 @@
+import hashlib
+import json
+import os
+import threading
+import uuid
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+# Default location and size of the on-disk tier
+CACHE_DIR = os.path.join('.cache', 'results')
+MAX_DISK_BYTES = 200 * 2**20
+
+# Model parameters that do not change the result of a run
+IGNORED_PARAMS = ('report', 'previous_solution')
+
+# Part of every key, raised when the cached cluster table changes so older runs are not read back
+CACHE_VERSION = 2
+
+
+class ResultCache:
+    """
+    Cache of model runs: (dataset hash, model, K, solver params) -> (labels, centroids, cluster_table).
+    The in-memory tier keeps the most recently used runs, the optional on-disk tier keeps one npz
+    file per run and drops the least recently used files above a size limit. One cache is shared by
+    the server threads, so every call holds a lock, and files removed by another process are misses.
+    """
+
+    def __init__(self, max_entries=32, cache_dir=None, max_disk_bytes=MAX_DISK_BYTES):
+        """
+        Parameters:
+            max_entries (int): Number of runs kept in memory.
+            cache_dir (str): Directory of the on-disk tier, None to keep runs in memory only.
+            max_disk_bytes (int): Size limit of the on-disk tier.
+        """
+        self.max_entries = max_entries
+        self.cache_dir = cache_dir
+        self.max_disk_bytes = max_disk_bytes
+        self.entries = OrderedDict()
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+        self.lock = threading.Lock()
+        if cache_dir is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(data_hash, model, num_clusters, params=None):
+        """
+        Returns:
+            str: Key of a run, stable across processes.
+        """
+        params = {key: value for key, value in (params or {}).items() if key not in IGNORED_PARAMS}
+        payload = json.dumps([CACHE_VERSION, data_hash, model, int(num_clusters), params], sort_keys=True, default=str)
+        return hashlib.sha1(payload.encode()).hexdigest()
+
+    def get(self, key):
+        """
+        Returns:
+            tuple: Copies of the labels, centroids and cluster table of the run, or None on a miss.
+        """
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.counters['memory_hits'] += 1
+                labels, centroids, cluster_table = self.entries[key]
+                return labels.copy(), centroids.copy(), cluster_table.copy()
+
+            path = self._path(key)
+            if path is not None:
+                try:
+                    labels, centroids, cluster_table = self._read(path)
+                    os.utime(path)
+                except FileNotFoundError:
+                    # Never written, or evicted by another process since
+                    pass
+                else:
+                    self._remember(key, (labels, centroids, cluster_table.copy()))
+                    self.counters['disk_hits'] += 1
+                    return labels, centroids, cluster_table
+
+            self.counters['misses'] += 1
+            return None
+
+    def put(self, key, labels, centroids, cluster_table):
+        result = (np.array(labels), np.array(centroids), cluster_table.copy())
+        with self.lock:
+            self._remember(key, result)
+            path = self._path(key)
+            if path is not None:
+                self._write(path, *result)
+                self._evict_disk()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit and miss counters and the number of runs held by each tier.
+        """
+        with self.lock:
+            stats = dict(self.counters, memory_entries=len(self.entries))
+            if self.cache_dir is not None:
+                stats['disk_entries'] = len(self._disk_files())
+            return stats
+
+    def _remember(self, key, result):
+        self.entries[key] = result
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+
+    def _path(self, key):
+        return None if self.cache_dir is None else os.path.join(self.cache_dir, f'{key}.npz')
+
+    def _disk_files(self):
+        return [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir) if name.endswith('.npz')]
+
+    def _evict_disk(self):
+        # Files removed by another process in the meantime are skipped
+        files = []
+        for path in self._disk_files():
+            try:
+                info = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((info.st_mtime, info.st_size, path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in files:
+            if total <= self.max_disk_bytes:
+                break
+            total -= size
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    @staticmethod
+    def _write(path, labels, centroids, cluster_table):
+        columns = {f'column_{i}': cluster_table[column].to_numpy() for i, column in enumerate(cluster_table.columns)}
+        # Write then rename, so a concurrent reader never sees a partial file, with a temporary file of
+        # its own for every writer, as other processes can share the directory
+        tmp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(tmp_path, 'wb') as file:
+            np.savez(file, labels=labels, centroids=centroids, index=cluster_table.index.to_numpy(),
+                     column_names=np.array(cluster_table.columns, dtype=str), **columns)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _read(path):
+        with np.load(path, allow_pickle=False) as data:
+            cluster_table = pd.DataFrame({str(name): data[f'column_{i}'] for i, name in enumerate(data['column_names'])},
+                                         index=data['index'])
+            return data['labels'], data['centroids'], cluster_table
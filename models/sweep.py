@@ -0,0 +1,56 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+import pandas as pd
+from metrics.clusters import evaluate_solution
+from models.jobs import MAX_WORKERS
+from models.pulp_model import SETUP_COST
+from models.reduction import solve_reduced
+
+
+def run_sweep(model, df, k_values, params=None, max_workers=MAX_WORKERS, reduction=None):
+    """
+    Solves every number of warehouses of a range in one batch, spread over a process pool.
+    Parameters:
+        model (function): Model function of `MODELS_TYPES`.
+        df (DataFrame): Preprocessed DataFrame.
+        k_values (iterable): Numbers of warehouses to solve.
+        params (dict): Extra keyword arguments of the model.
+        max_workers (int): Size of the process pool, by default the number of model jobs `models.jobs`
+            runs at the same time, so a sweep submitted as one job stays within the solve budget.
+        reduction (dict): Keyword arguments of `models.reduction.solve_reduced` to solve every number
+            of warehouses on demand-weighted super-points, None to solve every customer.
+    Returns:
+        DataFrame: One row per number of warehouses with its costs, average distance and solve time.
+    """
+    k_values = list(k_values)
+    # Fresh interpreters, as in `models.jobs`, so the workers do not inherit the threads of the caller
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = [executor.submit(solve_k, model, df, k, params or {}, reduction) for k in k_values]
+        rows = [future.result() for future in futures]
+    return pd.DataFrame(rows)
+
+
+def solve_k(model, df, num_clusters, params, reduction=None):
+    """
+    Solves one number of warehouses, on super-points when `reduction` is given, and evaluates the
+    solution on the customers.
+    Returns:
+        dict: Row of the sweep table.
+    """
+    start = time.perf_counter()
+    if reduction is None:
+        _, labels, centroids = model(df.copy(), num_clusters, **params)
+    else:
+        _, labels, centroids = solve_reduced(model, df.copy(), num_clusters, params, **reduction)
+    solve_time = time.perf_counter() - start
+
+    transport_cost, avg_distance = evaluate_solution(df, labels, centroids)
+    return {
+        'Warehouses': num_clusters,
+        'Transport Cost': transport_cost,
+        'Setup Cost': SETUP_COST * num_clusters,
+        'Total Cost': transport_cost + SETUP_COST * num_clusters,
+        'Average Distance': avg_distance,
+        'Solve Time': solve_time,
+    }
@@ -1,5 +1,4 @@
 import streamlit as st
-import pandas as pd
 import os
 import shutil
 from pages import home_page as home
@@ -8,16 +7,13 @@ from pages import home_page as home
 def main():
     """
     A self contained page of streamlit app. It gives option to upload the data. 
-    it Reads the data and passes it as dataframe to `/page/components/home.py`
+    The home page loads the cities of the selected country from the columnar store
+    of `data_exploration/loader.py`.
     """
     st.set_page_config(layout="wide")  # Set layout to wide
     st.markdown("---")
 
-    # read the csv file.
-    df = pd.read_csv('simplemaps_worldcities_basicv1.76\worldcities.csv', 
-    usecols = ['city', 'lat', 'lng','iso3', 'population', 'capital', 'admin_name', 'country'])
-    # pass the dataframe to home_page function in home.py
-    home.home_page(df)
+    home.home_page()
 
 
 if __name__ == "__main__":
@@ -1,14 +1,22 @@
+import os
+import time
 import streamlit as st
-from data_exploration import normal
-from models import kmeans, pulp_model
+from data_exploration import normal, loader, ingest
+from models import pulp_model, candidates, sweep, jobs
+from models.reduction import REDUCED_POINTS, REDUCTION_METHODS
+from models.registry import MODELS_TYPES
+from models.result_cache import ResultCache, CACHE_DIR
+from spatial.projection import PROJECTIONS
 from plots import folium_density, folium_plot
-from metrics import capacity
+from plots.aggregation import MAX_MAP_POINTS
+from metrics.clusters import ClusterMetrics
 from plots import plot_clusters_consumers
-from visualizations import pie, bar, folium_extra
+from profiling.trace import recording, span
+from visualizations import pie, bar, folium_extra, elbow, performance
 """ ## Warehouse Location Optimization App
 ### Current Functionality
 
-Our app currently utilizes a pre-stored dataset of world cities, providing you with a comprehensive base for your warehouse location analysis. We plan to expand the app's capabilities by incorporating an option for users to upload their own custom datasets, allowing for even greater flexibility and personalization.
+Our app utilizes a pre-stored dataset of world cities, providing you with a comprehensive base for your warehouse location analysis. You can also upload your own customer list (CSV or Parquet), which is streamed into the same columnar store, allowing for even greater flexibility and personalization.
 
 ### User Interface
 
@@ -24,14 +32,14 @@ Our app currently utilizes a pre-stored dataset of world cities, providing you w
 - We also envision on displaying a comparative results of the clustering algorithms that are used in the app.
 """
 
-MODELS_TYPES = {
-    'K-Means': kmeans.get_kmeans,
-    'Pulp': pulp_model.get_pulp
-}
 
+# Seconds between two polls of a running model job
+POLL_INTERVAL = 0.5
 
 
-def show_tabs(model_select, map_df, cluster_table, centroids, cluster_labels_df, cap, tab4, tab5, tab6, tab7, tab8):
+
+def show_tabs(model_select, map_df, cluster_table, centroids, cluster_labels_df, cap, tab4, tab5, tab6, tab7, tab8,
+              metrics=None):
     """
     Displays chart visualizations on selected tabs after model execution.
     Parameters:
@@ -41,59 +49,281 @@ def show_tabs(model_select, map_df, cluster_table, centroids, cluster_labels_df,
         centroids (array): Array of cluster centers.
         cluster_labels_df (DataFrame): DataFrame with cluster labels.
         cap (float): Total capacity of each warehouse.
-        tab4, tab5, tab6, tab7, tab8: Streamlit tab objects.
+        tab4, tab5, tab6, tab7, tab8: Streamlit tab objects, only the open one is drawn.
+        metrics (ClusterMetrics): Statistics behind the cluster table, shared by the charts.
     """
     if map_df is not None and cluster_table is not None:
-        # For each tab, display appropriate visualization and summary data
-        with tab4:
-            pie.piechart(cluster_table)
-        with tab5:
-            bar.barchart(cluster_table)
-        with tab6:
-            bar.demand_capacity_difference_barchart(cluster_table)
-        with tab7:
-            pie.piechart_cluster_count(cluster_table)
-        with tab8:
-            folium_extra.folium_extra(map_df, cluster_labels_df, centroids)
-        for tab in [tab4, tab5, tab6, tab7, tab8]:
-            # Display the summary information at the end of each tab
-            with tab:
-                st.markdown(
-                    f"**Total Capacity of each warehouse:** `{cap:,.2f}` Units.", unsafe_allow_html=True)
-                st.dataframe(cluster_table.loc[:, cluster_table.columns != 'Demand_Capacity_Difference'],
-                             use_container_width=True)
+        # Display the visualization of the selected tab only
+        charts = {
+            tab4: ('demand_pie', lambda: pie.piechart(cluster_table)),
+            tab5: ('distance_bar', lambda: bar.barchart(cluster_table)),
+            tab6: ('capacity_bar', lambda: bar.demand_capacity_difference_barchart(cluster_table)),
+            tab7: ('customers_pie', lambda: pie.piechart_cluster_count(cluster_table)),
+            tab8: ('centroid_map', lambda: folium_extra.folium_extra(map_df, cluster_labels_df, centroids, metrics)),
+        }
+        for tab, (name, chart) in charts.items():
+            if tab.open:
+                with tab, span(f'render.{name}'):
+                    chart()
 
 
-def get_model(model_select, df, num_clusters):
+def get_model(model_select, df, num_clusters, params=None):
     """
     Selects and returns the appropriate model function based on user selection.
     Parameters:
         model_select (str): Selected model.
         df (DataFrame): Preprocessed DataFrame.
         num_clusters (int): Selected number of clusters.
-        dataset_type (str): Selected dataset type.
+        params (dict): Extra keyword arguments of the selected model.
     Returns:
         function: Model function that returns returns dataframe, cluster labels, and centroids.
     """
-    return MODELS_TYPES[model_select](df, num_clusters)
+    return MODELS_TYPES[model_select](df, num_clusters, **(params or {}))
+
+
+def previous_solution(solution_key, num_clusters):
+    """
+    Returns the stored solution of the same country and model with the closest number of
+    warehouses, used to warm start the next run.
+    Parameters:
+        solution_key (tuple): Country iso3 code and model.
+        num_clusters (int): Selected number of clusters.
+    Returns:
+        tuple: Labels and centroids, or None when nothing was solved yet.
+    """
+    solutions = st.session_state.setdefault('solutions', {}).get(solution_key)
+    if not solutions:
+        return None
+    return solutions[min(solutions, key=lambda k: abs(k - num_clusters))]
+
+
+def store_solution(solution_key, num_clusters, labels, centroids):
+    """
+    Keeps the labels and centroids of a run for later warm starts.
+    """
+    st.session_state.setdefault('solutions', {}).setdefault(solution_key, {})[num_clusters] = (labels, centroids)
+
+
+@st.cache_resource
+def build_store():
+    """
+    Converts the world cities sheet into the columnar store once per server process.
+    Returns:
+        float: Seconds spent building the store, 0 when it was up to date.
+    """
+    return loader.build_store()
+
+
+@st.cache_data
+def load_country(iso3):
+    """
+    Loads the cities of one country, memoized across reruns and sessions.
+    """
+    return loader.load_country(iso3)
+
+
+@st.cache_data
+def prepare_data(iso3, seed, demand_model):
+    """
+    Loads the cities of one country and generates their demand. The result only depends on the
+    arguments, so it is memoized on them.
+    """
+    df = load_country(iso3)
+    df['customer_id'] = df.index
+    return normal.normal_data(df, seed=seed, demand_model=demand_model)
+
+
+@st.cache_data
+def prepare_dataset(name, version, seed):
+    """
+    Loads an uploaded customer dataset, whose demand comes with the file. Memoized on the name and
+    the version (modification time) of the stored dataset, so a new upload of the same name is reloaded.
+    """
+    df = loader.load_dataset(name)
+    df['customer_id'] = df.index
+    return normal.normal_data(df, seed=seed, demand_model='column')
+
+
+def upload_dataset():
+    """
+    Sidebar upload of a customer file, streamed into the columnar store once per uploaded file,
+    and selection of an uploaded dataset.
+    Returns:
+        str: Name of the selected dataset, None when nothing was uploaded yet.
+    """
+    uploaded = st.file_uploader(
+        "Customer file (CSV or Parquet)", type=['csv', 'parquet'],
+        help="One row per delivery point with latitude and longitude columns and an optional demand "
+             "column. Points sharing coordinates are merged, without demand each point is one unit. "
+             "Ingest files above the upload limit with `python -m data_exploration.ingest`.")
+    if uploaded is not None and st.session_state.get('ingested') != uploaded.file_id:
+        try:
+            with st.spinner("Ingesting the customer file..."):
+                summary = ingest.ingest(uploaded, ingest.dataset_name(uploaded.name))
+        except ValueError as error:
+            st.error(str(error))
+            st.stop()
+        st.session_state['ingested'], st.session_state['ingest_summary'] = uploaded.file_id, summary
+    summary = st.session_state.get('ingest_summary')
+    if summary is not None:
+        st.caption(f"{summary['dataset']}: {summary['rows']:,} rows read, "
+                   f"{sum(summary['rejected'].values()):,} rejected, {summary['duplicates_merged']:,} "
+                   f"duplicates merged into {summary['locations']:,} locations in {summary['seconds']:.1f} s")
+
+    names = loader.dataset_names()
+    if not names:
+        return None
+    selected = summary['dataset'] if summary is not None and summary['dataset'] in names else names[0]
+    return st.selectbox("Dataset", names, index=names.index(selected))
+
+
+@st.cache_resource
+def result_cache():
+    """
+    Result cache shared by all sessions, persisted on disk so runs survive server restarts.
+    """
+    return ResultCache(cache_dir=CACHE_DIR)
+
+
+@st.cache_resource
+def job_manager():
+    """
+    Background workers shared by all sessions, so concurrent users queue for a bounded number of solves.
+    """
+    return jobs.JobManager()
+
+
+def show_job_state(job_id, tab, label):
+    """
+    Shows the state of an unfinished job with a button to cancel it.
+    Parameters:
+        job_id (str): Id of the job in the job manager.
+        tab: Streamlit tab showing the job state.
+        label (str): What the job computes, e.g. "Solving".
+    Returns:
+        bool: True while the job is pending or running.
+    """
+    manager = job_manager()
+    status = manager.status(job_id)
+    if status['status'] not in (jobs.PENDING, jobs.RUNNING):
+        return False
+    with tab:
+        if status['status'] == jobs.PENDING:
+            st.info(f"{label}: waiting for a free worker, position {status['position']} in the queue")
+        else:
+            st.info(f"{label}... {status['elapsed']:.0f} s elapsed")
+        if st.button("Cancel run", key=f'cancel_{job_id}'):
+            manager.cancel(job_id)
+    return True
 
 
-def home_page(df):
+def poll_job(tab):
     """
-    The main function of the application. It displays sidebar, tabs, and visualizations.
+    Shows the state of the model job of the session. The results of a finished job are stored in
+    the session, and in the result cache and the warm starts when the model was solved.
     Parameters:
-        df (DataFrame): Original DataFrame.
+        tab: Streamlit tab showing the job state.
+    Returns:
+        bool: True while the job is not finished.
+    """
+    job = st.session_state['job']
+    if show_job_state(job['id'], tab, "Solving"):
+        return True
+
+    del st.session_state['job']
+    try:
+        result = job_manager().result(job['id'])
+    except RuntimeError as error:
+        with tab:
+            st.error(str(error))
+        return False
+    # A heuristic fallback of an unsolved model is shown once, but neither cached nor reused as a warm start
+    if (result['report'] or {}).get('solved', True):
+        store_solution(job['solution_key'], job['num_clusters'], result['labels'], result['centroids'])
+        result_cache().put(job['cache_key'], result['labels'], result['centroids'], result['cluster_table'])
+    st.session_state['results'] = dict(result, cache_key=job['cache_key'], cached=False)
+    return False
+
+
+def poll_sweep(tab):
+    """
+    Shows the state of the K sweep job of the session, whose table is stored in the session once finished.
+    Parameters:
+        tab: Streamlit tab showing the job state.
+    Returns:
+        bool: True while the job is not finished.
+    """
+    job = st.session_state['sweep_job']
+    if show_job_state(job['id'], tab, f"Sweeping {job['warehouses']} warehouse counts"):
+        return True
+
+    del st.session_state['sweep_job']
+    try:
+        st.session_state['sweep'] = (job['cache_key'], job_manager().result(job['id']))
+    except RuntimeError as error:
+        with tab:
+            st.error(str(error))
+    return False
+
+
+def home_page():
+    """
+    The main function of the application. It displays sidebar, tabs, and visualizations, with
+    the timings of the page and of the last model run in the Performance panel.
+    """
+    with recording(st.session_state.get('profile_stage')) as page_trace:
+        model_trace = render_page()
+
+    # Stages seen so far, offered for profiling
+    stage_names = st.session_state.setdefault('stage_names', set())
+    for trace in (page_trace, model_trace):
+        if trace is not None:
+            stage_names.update(record['name'] for record in trace.spans)
+    performance.performance_panel(page_trace, model_trace)
+
+
+def render_page():
+    """
+    Sidebar, tabs and visualizations of the application.
+    Returns:
+        Trace: Trace of the model job behind the displayed results, None without one.
     """
     # Sidebar for the app
     with st.sidebar:
         # Dataset type selection
         st.sidebar.header("⚙️ Data Settings")
-        dataset_type = st.text_input(
-            "Enter iso3 code of country", 'ITA')
+        source = st.radio("Customers", ['cities', 'upload'], horizontal=True,
+                          format_func=lambda source: {'cities': 'World cities', 'upload': 'Uploaded file'}[source])
+        if source == 'cities':
+            dataset_type = st.text_input(
+                "Enter iso3 code of country", 'ITA')
+
+            demand_model = st.selectbox("Demand model", ['population', 'log'],
+                                        format_func=lambda model: {'population': 'Population fraction',
+                                                                   'log': 'Log-scaled population'}[model])
+        else:
+            dataset_type = upload_dataset()
+            if dataset_type is None:
+                st.info("Upload a customer file to start")
+                st.stop()
+        seed = st.number_input("Demand seed", min_value=0, value=normal.DEFAULT_SEED)
+        max_points = st.number_input("Map points before grid aggregation", min_value=100, value=MAX_MAP_POINTS,
+                                     step=1000)
 
-        df = df[df['iso3'] == dataset_type.upper()]
-        df['customer_id'] = df.index
-        df = normal.normal_data(df)
+        # Only the partition of the selected country or dataset is read
+        build_time = build_store()
+        with span('page.prepare_data', dataset=dataset_type) as load_span:
+            if source == 'cities':
+                df = prepare_data(dataset_type.upper(), seed, demand_model)
+            else:
+                df = prepare_dataset(dataset_type, os.path.getmtime(loader.dataset_path(dataset_type)), seed)
+        load_time = load_span['duration']
+        if df.empty:
+            st.warning(f"No cities found for the iso3 code '{dataset_type}'")
+            st.stop()
+        rows = 'cities' if source == 'cities' else 'customers'
+        st.caption(f"{len(df):,} {rows} loaded in {load_time * 1000:.1f} ms"
+                   + (f" (store built in {build_time:.1f} s)" if build_time else ""))
 
         # Model selection
         st.sidebar.header("📊 Plot Settings")
@@ -111,44 +341,189 @@ def home_page(df):
                 "Number of warehouses", min_value=values[0], max_value=values[1], value=int((values[0]+values[1])/2))
         else:
             st.write('Please select a range of values')
+        sweep_mode = st.checkbox("Sweep every number of warehouses in the range")
+
+        # Model settings
+        params = {}
+        if model_select == 'K-Means':
+            st.sidebar.header("🧭 K-Means Settings")
+            params['weighted'] = st.checkbox("Weight customers by demand", value=True)
+            params['projection'] = st.selectbox(
+                "Coordinates", PROJECTIONS,
+                format_func=lambda projection: {'latlng': 'Raw latitude/longitude', 'sphere': '3D unit sphere',
+                                                'equal_area': 'Equal-area projection'}[projection],
+                index=PROJECTIONS.index('sphere'))
+        if model_select == 'Pulp':
+            st.sidebar.header("🧮 Pulp Settings")
+            params['candidate_method'] = st.selectbox(
+                "Candidate sites", list(candidates.CANDIDATE_METHODS),
+                format_func=lambda method: {'sample': 'Random cities', 'kmeans++': 'Demand-weighted k-means++',
+                                            'grid': 'Heaviest grid cells', 'population': 'Most populated cities'}[method],
+                index=list(candidates.CANDIDATE_METHODS).index('kmeans++'))
+            params['candidate_factor'] = st.number_input(
+                "Candidate sites per warehouse", min_value=1, max_value=50, value=candidates.CANDIDATE_FACTOR,
+                help="The model opens the selected number of warehouses among the candidate sites")
+            if st.checkbox("Sparse formulation (nearest candidates only)"):
+                params['formulation'] = 'sparse'
+                params['k_nearest'] = st.number_input(
+                    "Candidate warehouses per customer", min_value=1, max_value=30, value=pulp_model.K_NEAREST)
+                params['single_sourcing'] = st.checkbox("Single sourcing")
+                params['compare_full'] = st.checkbox("Compare with the full model")
+
+            # Solver backend and limits
+            with st.expander("Solver settings"):
+                backend = st.selectbox("Backend", pulp_model.available_backends())
+                time_limit = st.number_input("Time limit in seconds (0 for none)", min_value=0, value=60)
+                gap = st.number_input("Relative MIP gap in % (0 for solver default)",
+                                      min_value=0.0, max_value=100.0, value=1.0)
+                threads = st.number_input("Threads (0 for solver default)", min_value=0, max_value=64, value=0)
+                params['solver_config'] = {
+                    'backend': backend,
+                    'time_limit': time_limit or None,
+                    'gap': gap / 100 or None,
+                    'threads': threads or None,
+                    'warm_start': st.checkbox("Warm start"),
+                }
+        if model_select in ('Pulp', 'Capacitated K-Means'):
+            params['report'] = {}
+
+        # The models solve demand-weighted super-points and the labels are projected back to the customers
+        st.sidebar.header("🧩 Customer Reduction")
+        reduction = None
+        if st.checkbox("Solve on demand-weighted super-points", value=len(df) > REDUCED_POINTS):
+            reduction = {
+                'max_points': st.number_input("Super-points", min_value=30, value=REDUCED_POINTS, step=500),
+                'method': st.selectbox("Binning", list(REDUCTION_METHODS),
+                                       format_func=lambda method: {'grid': 'Grid cells',
+                                                                   'microcluster': 'Micro-clusters'}[method]),
+                'compare_full': st.checkbox("Compare with the full-resolution solve"),
+            }
+
+        # One stage of the next runs is run under cProfile, a profiled model run skips the result cache
+        with st.expander("Profiling"):
+            profile_stage = st.selectbox(
+                "Profile stage", [None] + sorted(st.session_state.get('stage_names', ())),
+                format_func=lambda stage: 'Off' if stage is None else stage, key='profile_stage')
 
         # Run model button
         run_button = st.button("Run")
 
-    # Create all tabs at once
+    # Create all tabs at once, switching tabs reruns the page and only the open tab is computed
     tabs = st.tabs(["Model results", "Customer Demand plot", "Customer density plot", "Demand per cluster",
-                   "Avg distance from cluster", "Demand-capacity constraint", "Customers per cluster", "Cluster density plot"])
+                   "Avg distance from cluster", "Demand-capacity constraint", "Customers per cluster", "Cluster density plot"],
+                   key='tab', on_change='rerun')
     
-    # these tabs are always visible.
-    with tabs[1]:
-        mp = folium_plot.pydeck_plot_data(df)
-        st.pydeck_chart(mp)
-    with tabs[2]:
-        mp = folium_density.pydeck_density_data(df)
-        st.pydeck_chart(mp)
+    # these tabs are always available.
+    if tabs[1].open:
+        with tabs[1], span('render.demand_map'):
+            mp = folium_plot.pydeck_plot_data(df, max_points)
+            st.pydeck_chart(mp)
+    if tabs[2].open:
+        with tabs[2], span('render.density_map'):
+            mp = folium_density.pydeck_density_data(df, max_points)
+            st.pydeck_chart(mp)
 
     # Run the model and display the results
+    cache = result_cache()
+    cache_key = cache.make_key(normal.dataset_hash(df), model_select, num_clusters, dict(params, reduction=reduction))
     if run_button:
-        #  # Run the model and display the results
-        df, cluster_labels, centroids = get_model(
-            model_select, df, num_clusters)
-        
+        # Solve every number of warehouses of the range in parallel in a background job, for the elbow
+        # curve, at the resolution of the single run (on its super-points when reduced)
+        if sweep_mode:
+            sweep_params = {key: value for key, value in params.items() if key != 'report'}
+            sweep_reduction = None if reduction is None else dict(reduction, compare_full=False)
+            k_values = range(values[0], values[1] + 1)
+            st.session_state['sweep_job'] = {
+                'id': job_manager().submit(sweep.run_sweep, MODELS_TYPES[model_select], df, k_values, sweep_params,
+                                           reduction=sweep_reduction, timeout=jobs.JOB_TIMEOUT * len(k_values)),
+                'cache_key': cache_key, 'warehouses': len(k_values)}
+
+        # Identical inputs are served from the result cache, others are solved by a background job
+        cached = None if profile_stage else cache.get(cache_key)
+        if cached is None:
+            # warm started from the closest solved warehouse count
+            solution_key = (source, dataset_type.upper(), model_select)
+            params['previous_solution'] = previous_solution(solution_key, num_clusters)
+            st.session_state['job'] = {
+                'id': job_manager().submit(jobs.run_model, MODELS_TYPES[model_select], df, num_clusters, params,
+                                           profile=profile_stage, reduction=reduction),
+                'cache_key': cache_key, 'solution_key': solution_key, 'num_clusters': num_clusters}
+        else:
+            cluster_labels, centroids, cluster_table = cached
+            df['Cluster'] = cluster_labels
+            st.session_state['results'] = {
+                'df': df, 'labels': cluster_labels, 'centroids': centroids, 'cluster_table': cluster_table,
+                'cap': cluster_table['Capacities in Units'].iloc[0], 'report': None, 'reduction': None,
+                'trace': None, 'cache_key': cache_key, 'cached': True}
+
+    # Rerun the page until the jobs of the session finish
+    running = 'sweep_job' in st.session_state and poll_sweep(tabs[0])
+    running = 'job' in st.session_state and poll_job(tabs[0]) or running
+    if running:
+        time.sleep(POLL_INTERVAL)
+        st.rerun()
+
+    # Results of the last run, as long as the inputs did not change
+    sweep_result = st.session_state.get('sweep')
+    if sweep_result is not None and sweep_result[0] == cache_key and tabs[0].open:
+        with tabs[0]:
+            elbow.elbow_chart(sweep_result[1])
+            st.dataframe(sweep_result[1], use_container_width=True)
+
+    results = st.session_state.get('results')
+    if results is not None and results['cache_key'] == cache_key:
+        df, centroids, cluster_table, cap = results['df'], results['centroids'], results['cluster_table'], results['cap']
+        report = results['report']
+        metrics = ClusterMetrics.from_table(cluster_table)
+
         if dataset_type == "Repetition":
             df = df.drop_duplicates() 
         cluster_labels_df = df['Cluster']
 
         with tabs[0]:
             # Visualize the cluster on the map and display the capacity summary df
-            plot_clusters_consumers.visualize_clusters_on_map(
-                df, cluster_labels_df, centroids)
-            cluster_table, cap = capacity.capcacity_display(df, centroids)
-            st.markdown(
-                f"**Total Capacity of each warehouse:** `{cap:,.2f}` Units.", unsafe_allow_html=True)
-            st.dataframe(cluster_table, use_container_width=True)
+            if tabs[0].open:
+                with span('render.cluster_map'):
+                    plot_clusters_consumers.visualize_clusters_on_map(
+                        df, cluster_labels_df, centroids, metrics, max_points)
+            if results['cached']:
+                st.success("Results loaded from the cache")
+            if report and 'status' in report:
+                col1, col2, col3, col4 = st.columns(4)
+                col1.metric("Solve status", f"{report['status']} ({report['solution_status']})")
+                col2.metric("MIP gap", "n/a" if report['gap'] is None else f"{report['gap']:.2%}")
+                col3.metric("Model build time", f"{report['build_time'] + report.get('load_time', 0):.2f} s",
+                            help=f"Arrays built in {report['build_time']:.2f} s, handed to the solver through "
+                                 f"{report.get('solver_path', 'pulp')} in {report.get('load_time', 0):.2f} s")
+                col4.metric("Solve wall time", f"{report['solve_time']:.2f} s")
+                if not report.get('solved', True):
+                    st.warning(f"The solver returned no solution ({report['status']}), the warehouses were "
+                               "picked by the greedy cost heuristic instead")
+            if report:
+                with st.expander("Model report"):
+                    st.json(report)
+            reduction_report = results.get('reduction')
+            if reduction_report:
+                col1, col2, col3 = st.columns(3)
+                col1.metric("Super-points", f"{reduction_report['super_points']:,} / {reduction_report['customers']:,}")
+                col2.metric("Cost change after projection", f"{reduction_report['cost_change']:+.2%}")
+                if 'cost_change_vs_full' in reduction_report:
+                    col3.metric("Cost change vs full resolution", f"{reduction_report['cost_change_vs_full']:+.2%}")
+                with st.expander("Reduction report"):
+                    st.json(reduction_report)
+            st.caption("Result cache: " + ", ".join(f"{key.replace('_', ' ')} {value}"
+                                                    for key, value in cache.stats().items()))
 
         # Display the additional tabs with model results
         show_tabs(model_select, df, cluster_table,
-                  centroids, cluster_labels_df, cap, *tabs[3:])
+                  centroids, cluster_labels_df, cap, *tabs[3:], metrics=metrics)
+
+        # The capacity summary is rendered once, below the tabs, instead of once per tab
+        with span('render.cluster_table'):
+            st.markdown(
+                f"**Total Capacity of each warehouse:** `{cap:,.2f}` Units.", unsafe_allow_html=True)
+            st.dataframe(cluster_table, use_container_width=True)
+        return results.get('trace')
     else:
         # ask the user to run the model.
         with tabs[0]:
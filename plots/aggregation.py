@@ -0,0 +1,84 @@
+import numpy as np
+import pandas as pd
+from spatial.grid import grid_cells, weighted_centres
+
+# Points sent to the browser by a map layer, customers beyond it are aggregated into grid cells
+MAX_MAP_POINTS = 10000
+
+# Decimals of the coordinates sent to the browser, about a metre
+COORDINATE_DECIMALS = 5
+
+
+def grid_aggregate(lat, lng, weights, max_points=MAX_MAP_POINTS):
+    """
+    Bins points into a latitude/longitude grid whose number of non-empty cells stays within
+    `max_points`, the finest of a few doublings of the resolution. Every cell becomes one point at
+    the weighted centre of its points.
+    Parameters:
+        lat, lng (array-like): Coordinates in degrees.
+        weights (array-like): Weight of every point, e.g. its demand.
+        max_points (int): Maximum number of cells.
+    Returns:
+        tuple: DataFrame with lat, lon, weight and count columns, one row per non-empty cell, and
+        the cell size in km.
+    """
+    weights = np.asarray(weights, dtype=float)
+    cells, cell_km = grid_cells(lat, lng, max_points)
+    count = np.bincount(cells)
+    total = np.bincount(cells, weights=weights)
+    centre_lat, centre_lng = weighted_centres(cells, lat, lng, weights)
+    return pd.DataFrame({'lat': centre_lat, 'lon': centre_lng, 'weight': total, 'count': count}), cell_km
+
+
+def map_points(df, weight_column='Demand', max_points=MAX_MAP_POINTS):
+    """
+    Columnar layer data of the customers, aggregated into grid cells above `max_points` customers.
+    Parameters:
+        df (DataFrame): Customers with lat, lng and the weight column.
+        weight_column (str): Column summed per cell.
+        max_points (int): Point limit, None to never aggregate.
+    Returns:
+        tuple: DataFrame with lat, lon, weight and count columns, and the cell size in km (None when not aggregated).
+    """
+    weights = pd.to_numeric(df[weight_column], errors='coerce').fillna(0).to_numpy(dtype=float)
+    if max_points is None or len(df) <= max_points:
+        data, cell_km = pd.DataFrame({'lat': df['lat'].to_numpy(dtype=float), 'lon': df['lng'].to_numpy(dtype=float),
+                                      'weight': weights, 'count': 1}), None
+    else:
+        data, cell_km = grid_aggregate(df['lat'], df['lng'], weights, max_points)
+    data[['lat', 'lon']] = data[['lat', 'lon']].round(COORDINATE_DECIMALS)
+    return data, cell_km
+
+
+def normalise(values):
+    """
+    Values rescaled to [0, 1], all zeros when they are constant.
+    """
+    values = np.asarray(values, dtype=float)
+    span = np.ptp(values) if len(values) else 0
+    return (values - values.min()) / span if span else np.zeros_like(values)
+
+
+def thin_points(labels, max_points=MAX_MAP_POINTS, seed=0):
+    """
+    Deterministic stratified sample of at most about `max_points` points, every cluster keeping its
+    share of the points and at least one, so small clusters stay visible.
+    Parameters:
+        labels (array-like): Cluster of every point.
+        max_points (int): Point limit, None to keep every point.
+        seed (int): Seed of the sample.
+    Returns:
+        ndarray: Sorted positions of the kept points.
+    """
+    labels = np.asarray(labels, dtype=int)
+    if max_points is None or len(labels) <= max_points:
+        return np.arange(len(labels))
+    counts = np.bincount(labels)
+    quota = np.maximum(1, np.floor(counts * max_points / len(labels))).astype(int)
+
+    # Rank of every point inside its cluster in a random order, the lowest ranks are kept
+    order = np.lexsort((np.random.default_rng(seed).random(len(labels)), labels))
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    rank = np.empty(len(labels), dtype=int)
+    rank[order] = np.arange(len(labels)) - starts[labels[order]]
+    return np.flatnonzero(rank < quota[labels])
@@ -1,25 +1,32 @@
 import pydeck as pdk
 import numpy as np
 import pandas as pd
-
-
-def pydeck_density_data(df):
-    # Example latitude and longitude data from DataFrame
-    latitude = df['lat']
-    longitude = df['lng']
-    df['Demand'] = pd.to_numeric(df['Demand'], errors='coerce')
+from plots.aggregation import MAX_MAP_POINTS, map_points, normalise
+from profiling.trace import count, span
+
+
+def pydeck_density_data(df, max_points=MAX_MAP_POINTS):
+    """
+    Heatmap of the customer demand. Above `max_points` customers the points are grid cells whose
+    weight is the sum of their normalized demands, so the heat is preserved and the payload bounded.
+    Parameters:
+        df (DataFrame): Customers with lat, lng and Demand columns.
+        max_points (int): Number of points before aggregating, None to never aggregate.
+    Returns:
+        pdk.Deck: The map.
+    """
+    # Normalize the demand values between 0 and 1, per customer
+    normalized = df[['lat', 'lng']].copy()
+    normalized['weight'] = normalise(pd.to_numeric(df['Demand'], errors='coerce').fillna(0))
+
+    # Columnar layer data, one row per customer or per grid cell
+    with span('plot.density_points', customers=len(df)):
+        data, _ = map_points(normalized, 'weight', max_points)
+        data = data[['lat', 'lon', 'weight']].round({'weight': 4})
+    count('plot.map_points', len(data))
 
     # Create a pydeck map centered on the average location
-    center_lat, center_lon = latitude.mean(), longitude.mean()
-
-    # Normalize the demand values between 0 and 1
-    normalized_demand = (df['Demand'] - df['Demand'].min()) / \
-        (df['Demand'].max() - df['Demand'].min())
-    df['NormalizedDemand'] = normalized_demand
-
-    # Create data for pydeck Layer
-    data = [{"lat": lat, "lon": lon, "weight": weight}
-            for lat, lon, weight in zip(latitude, longitude, normalized_demand)]
+    center_lat, center_lon = df['lat'].mean(), df['lng'].mean()
 
     # Create the pydeck Layer
     heatmap_layer = pdk.Layer(
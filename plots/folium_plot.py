@@ -1,32 +1,40 @@
+import numpy as np
 import pydeck as pdk
+from plots.aggregation import MAX_MAP_POINTS, map_points, normalise
+from profiling.trace import count, span
 
-def calculate_color(demand, min_demand, max_demand):
-    # Normalize the demand value to a range between 0 and 1
-    normalized_demand = (demand - min_demand) / (max_demand - min_demand)
+def calculate_color(normalized_demand):
+    # Linearly interpolate between green and red, for a whole column of normalized demands
+    normalized_demand = np.asarray(normalized_demand, dtype=float)
+    red = (255 * normalized_demand).astype(np.uint8)
+    green = (255 * (1 - normalized_demand)).astype(np.uint8)
 
-    # Linearly interpolate between green and red
-    red = int(255 * normalized_demand)
-    green = int(255 * (1 - normalized_demand))
+    # Return the red and green channels, blue is 0 and alpha 128
+    return red, green
 
-    # Return the color as an array of [red, green, blue, alpha]
-    return [red, green, 0, 128]
 
-
-def pydeck_plot_data(df):
-    # Extract latitude, longitude, and demand data from DataFrame
-    latitude = df['lat']
-    longitude = df['lng']
-    demand = df['Demand']
+def pydeck_plot_data(df, max_points=MAX_MAP_POINTS):
+    """
+    Column map of the customer demand. Above `max_points` customers the columns are grid cells
+    holding the summed demand, so the payload stays bounded.
+    Parameters:
+        df (DataFrame): Customers with lat, lng and Demand columns.
+        max_points (int): Number of columns before aggregating, None to never aggregate.
+    Returns:
+        pdk.Deck: The map.
+    """
+    # Columnar layer data, one row per customer or per grid cell
+    with span('plot.demand_points', customers=len(df)):
+        data, cell_km = map_points(df, 'Demand', max_points)
+    count('plot.map_points', len(data))
 
     # Create a pydeck map centered on the average location
-    center_lat, center_lon = latitude.mean(), longitude.mean()
-
-    # Get the min and max demand values for color calculation and height normalization
-    min_demand, max_demand = df['Demand'].min(), df['Demand'].max()
+    center_lat, center_lon = df['lat'].mean(), df['lng'].mean()
 
-    # Create data for pydeck Layer
-    data = [{"lat": lat, "lon": lon, "elevation": ((demand - min_demand) / (max_demand - min_demand)) * 100000, "color": calculate_color(demand, min_demand, max_demand)}
-            for lat, lon, demand in zip(latitude, longitude, demand)]
+    # Height and color follow the demand normalized between its min and max
+    normalized_demand = normalise(data['weight'])
+    data['elevation'] = (normalized_demand * 100000).round()
+    data['red'], data['green'] = calculate_color(normalized_demand)
 
     # Create the pydeck Layer
     layer = pdk.Layer(
@@ -34,12 +42,11 @@ def pydeck_plot_data(df):
         data=data,
         get_position=["lon", "lat"],
         get_elevation="elevation",
-        get_fill_color="color",
-        radius=1000,  # Radius of column
+        get_fill_color="[red, green, 0, 128]",
+        radius=1000 if cell_km is None else max(1000, cell_km * 500),  # Radius of column, half a cell when aggregated
         elevation_scale=1,
         pickable=True,
         auto_highlight=True,
-        get_tooltip=["lat", "lon", "elevation"]  # Add tooltip here
     )
 
     # Create the pydeck Deck object
@@ -52,9 +59,8 @@ def pydeck_plot_data(df):
             pitch=45,
             bearing=0
         ),
-        map_style="mapbox://styles/mapbox/light-v10"  # Use a lighter map style
+        map_style="mapbox://styles/mapbox/light-v10",  # Use a lighter map style
+        tooltip={"text": "Demand: {weight}\nCustomers: {count}"}
     )
 
     return deck
-
-    
\ No newline at end of file
@@ -0,0 +1,146 @@
+import contextvars
+import cProfile
+import io
+import marshal
+import os
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+import pandas as pd
+
+# Trace recording the spans of the current thread, spans outside a recording only time themselves
+_ACTIVE = contextvars.ContextVar('trace', default=None)
+
+# Functions listed in the text dump of a profiled stage
+PROFILE_LINES = 40
+
+
+class Trace:
+    """
+    Spans and counters recorded while a trace is active, see `recording`. Spans are timed stages
+    (nested `span` blocks), counters are running totals (rows, candidates, solver calls...).
+    Traces recorded in other processes, e.g. by a model job, are combined with `merge`.
+    """
+
+    def __init__(self, profile=None):
+        # Name of the stage run under cProfile, None to profile nothing
+        self.profile = profile
+        self.spans = []
+        self.counters = {}
+        self.profiles = {}
+        self._depth = 0
+        self._profiling = False
+
+    def merge(self, other):
+        """
+        Adds the spans, counters and profiles of another trace.
+        """
+        if other is not None:
+            self.spans.extend(other.spans)
+            for name, value in other.counters.items():
+                self.counters[name] = self.counters.get(name, 0) + value
+            self.profiles.update(other.profiles)
+        return self
+
+    def table(self):
+        """
+        Returns:
+            DataFrame: One row per stage in order of first start, with its calls and total, mean
+            and max wall time in ms.
+        """
+        if not self.spans:
+            return pd.DataFrame(columns=['Stage', 'Calls', 'Total (ms)', 'Mean (ms)', 'Max (ms)'])
+        spans = pd.DataFrame(self.spans).sort_values('start')
+        spans['duration'] *= 1000
+        table = spans.groupby('name', sort=False).agg(
+            Calls=('duration', 'size'), Total=('duration', 'sum'), Mean=('duration', 'mean'),
+            Max=('duration', 'max'), depth=('depth', 'min'))
+        # Nested stages are marked with one dot per level
+        table.index = ['· ' * depth + name for name, depth in zip(table.index, table.pop('depth'))]
+        return table.rename(columns={'Total': 'Total (ms)', 'Mean': 'Mean (ms)', 'Max': 'Max (ms)'}) \
+            .rename_axis('Stage').reset_index()
+
+    def chrome_trace(self):
+        """
+        Returns:
+            dict: The trace in the Chrome trace event format, for chrome://tracing or Perfetto.
+        """
+        events = [{'name': record['name'], 'ph': 'X', 'ts': record['start'] * 1e6, 'dur': record['duration'] * 1e6,
+                   'pid': record['pid'], 'tid': record['tid'], 'args': record['attributes']}
+                  for record in self.spans]
+        end = max((record['start'] + record['duration'] for record in self.spans), default=time.time())
+        events += [{'name': name, 'ph': 'C', 'ts': end * 1e6, 'pid': os.getpid(), 'args': {name: value}}
+                   for name, value in self.counters.items()]
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+@contextmanager
+def recording(profile=None):
+    """
+    Records the spans and counters of the enclosed code into a new trace.
+    Parameters:
+        profile (str): Name of a stage to run under cProfile, see `Trace.profiles`.
+    Returns:
+        Trace: The trace, filled when the block exits.
+    """
+    trace = Trace(profile)
+    token = _ACTIVE.set(trace)
+    try:
+        yield trace
+    finally:
+        _ACTIVE.reset(token)
+
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Times a stage. The yielded dictionary holds the wall time in seconds under 'duration' once
+    the block exits, and is added to the active trace if there is one.
+    Parameters:
+        name (str): Name of the stage, dotted by module, e.g. 'pulp.solve'.
+        attributes: Values shown with the span, e.g. sizes.
+    """
+    trace = _ACTIVE.get()
+    record = {'name': name, 'start': time.time(), 'duration': 0.0, 'attributes': attributes,
+              'depth': 0, 'pid': os.getpid(), 'tid': threading.get_ident()}
+    profiler = None
+    if trace is not None:
+        record['depth'] = trace._depth
+        trace._depth += 1
+        # Only one stage is profiled at a time, cProfile does not nest
+        if trace.profile == name and not trace._profiling:
+            profiler, trace._profiling = cProfile.Profile(), True
+            profiler.enable()
+    start = time.perf_counter()
+    try:
+        yield record
+    finally:
+        record['duration'] = time.perf_counter() - start
+        if profiler is not None:
+            profiler.disable()
+            trace.profiles[name], trace._profiling = profile_dump(profiler), False
+        if trace is not None:
+            trace._depth -= 1
+            trace.spans.append(record)
+
+
+def count(name, value=1):
+    """
+    Adds `value` to a counter of the active trace, nothing when no trace is recorded.
+    """
+    trace = _ACTIVE.get()
+    if trace is not None:
+        trace.counters[name] = trace.counters.get(name, 0) + value
+
+
+def profile_dump(profiler):
+    """
+    Returns:
+        dict: The top functions by cumulative time as text, and the raw statistics in the .prof
+        format read by pstats and snakeviz.
+    """
+    profiler.create_stats()
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats('cumulative').print_stats(PROFILE_LINES)
+    return {'text': stream.getvalue(), 'prof': marshal.dumps(profiler.stats)}
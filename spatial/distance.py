@@ -0,0 +1,74 @@
+import numpy as np
+from math import sin, cos, acos, radians
+
+# Mean earth radius in km, shared by the scalar and the batched distance functions
+EARTH_RADIUS_KM = 6371.01
+
+# Fuel price and consumption used to turn a distance into a transport cost
+PETROL_PRICE = 1.87
+MILEAGE = 0.38
+
+
+#Calculate Haversine distance between two locations
+def haversine_distance(lat1, lon1, lat2, lon2):
+    return EARTH_RADIUS_KM *\
+        acos(sin(radians(lat1))*sin(radians(lat2)) +
+             cos(radians(lat1))*cos(radians(lat2))*cos(radians(lon1)-radians(lon2)))
+
+
+def haversine_matrix(lat1, lng1, lat2, lng2, dtype=np.float64):
+    """
+    Great-circle distances between every point of a first set and every point of a second set.
+    Parameters:
+        lat1, lng1 (array-like): Coordinates in degrees of the first set (e.g. warehouses), length K.
+        lat2, lng2 (array-like): Coordinates in degrees of the second set (e.g. customers), length N.
+        dtype: Floating point type of the computation and of the result (np.float32 or np.float64).
+    Returns:
+        ndarray: (K, N) matrix of distances in km. Agrees with `haversine_distance` up to
+        floating point rounding; the haversine form is used because it stays accurate for
+        short distances, where acos loses precision (especially in float32).
+    """
+    phi1 = np.radians(np.asarray(lat1, dtype=dtype))[:, None]
+    lam1 = np.radians(np.asarray(lng1, dtype=dtype))[:, None]
+    phi2 = np.radians(np.asarray(lat2, dtype=dtype))[None, :]
+    lam2 = np.radians(np.asarray(lng2, dtype=dtype))[None, :]
+
+    a = np.sin((phi2 - phi1) / 2) ** 2 + \
+        np.cos(phi1) * np.cos(phi2) * np.sin((lam2 - lam1) / 2) ** 2
+    np.clip(a, 0, 1, out=a)
+    return (2 * EARTH_RADIUS_KM) * np.arcsin(np.sqrt(a))
+
+
+def haversine_array(lat1, lng1, lat2, lng2, dtype=np.float64):
+    """
+    Element-wise great-circle distances between two sets of points of the same length.
+    Returns:
+        ndarray: Distances in km, entry i between point i of the first and point i of the second set.
+    """
+    phi1 = np.radians(np.asarray(lat1, dtype=dtype))
+    phi2 = np.radians(np.asarray(lat2, dtype=dtype))
+    dlam = np.radians(np.asarray(lng2, dtype=dtype)) - np.radians(np.asarray(lng1, dtype=dtype))
+
+    a = np.sin((phi2 - phi1) / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlam / 2) ** 2
+    return (2 * EARTH_RADIUS_KM) * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+
+#Calculate Travelling cost when distance is passed as parameter (scalar or array)
+def travelling_cost(distance):
+    return PETROL_PRICE*MILEAGE*distance
+
+
+def cost_matrix(warehouse_df, customer_df, dtype=np.float64):
+    """
+    Transport cost from every warehouse to every customer in one batched call.
+    Parameters:
+        warehouse_df (DataFrame): Warehouse locations with lat and lng columns.
+        customer_df (DataFrame): Customer locations with lat and lng columns.
+        dtype: np.float32 or np.float64.
+    Returns:
+        ndarray: (K, N) matrix, row i holding the costs of warehouse i to every customer.
+    """
+    distances = haversine_matrix(warehouse_df['lat'].to_numpy(), warehouse_df['lng'].to_numpy(),
+                                 customer_df['lat'].to_numpy(), customer_df['lng'].to_numpy(),
+                                 dtype=dtype)
+    return travelling_cost(distances).astype(dtype, copy=False)
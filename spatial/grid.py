@@ -0,0 +1,49 @@
+import numpy as np
+
+# Grid refinements tried to get as close as possible to the cell limit
+MAX_REFINEMENTS = 4
+
+# Km per degree of latitude
+KM_PER_DEGREE = 111.2
+
+
+def grid_cells(lat, lng, max_cells):
+    """
+    Bins points into a latitude/longitude grid whose number of non-empty cells stays within
+    `max_cells`, the finest of a few doublings of the resolution.
+    Parameters:
+        lat, lng (array-like): Coordinates in degrees.
+        max_cells (int): Maximum number of non-empty cells.
+    Returns:
+        tuple: Cell of every point, numbered from 0 without gaps, and the cell size in km.
+    """
+    lat, lng = np.asarray(lat, dtype=float), np.asarray(lng, dtype=float)
+    lat_span, lng_span = np.ptp(lat) or 1.0, np.ptp(lng) or 1.0
+
+    def bin_points(side):
+        rows = np.floor((lat - lat.min()) / lat_span * side).clip(0, side - 1).astype(np.int64)
+        cols = np.floor((lng - lng.min()) / lng_span * side).clip(0, side - 1).astype(np.int64)
+        return np.unique(rows * side + cols, return_inverse=True)[1]
+
+    # A side of sqrt(max_cells) can never exceed the limit, refine while the occupied cells still fit
+    side = max(1, int(np.sqrt(max_cells)))
+    cells = bin_points(side)
+    for _ in range(MAX_REFINEMENTS):
+        finer = bin_points(2 * side)
+        if finer.max() + 1 > max_cells:
+            break
+        side, cells = 2 * side, finer
+    return cells, lat_span / side * KM_PER_DEGREE
+
+
+def weighted_centres(cells, lat, lng, weights):
+    """
+    Weighted centre of the points of every cell. The small offset falls back to the plain centre
+    for weightless cells.
+    Returns:
+        tuple: Latitudes and longitudes of the centres, one per cell.
+    """
+    centre_weights = np.maximum(np.asarray(weights, dtype=float), 0) + 1e-9
+    norm = np.bincount(cells, weights=centre_weights)
+    return (np.bincount(cells, weights=np.asarray(lat, dtype=float) * centre_weights) / norm,
+            np.bincount(cells, weights=np.asarray(lng, dtype=float) * centre_weights) / norm)
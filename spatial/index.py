@@ -0,0 +1,106 @@
+import numpy as np
+from sklearn.neighbors import BallTree
+from spatial.distance import EARTH_RADIUS_KM, haversine_array
+
+# Neighbours fetched by the first round of a nearest-with-capacity query, multiplied on every further round
+INITIAL_NEIGHBOURS = 8
+GROWTH = 4
+
+
+class SpatialIndex:
+    """
+    Great-circle index over a set of points (customers, candidate sites or warehouses), answering
+    k-nearest, radius and nearest-with-capacity queries in km. The BallTree is built on the first
+    query and reused by the following ones, so one index serves a whole model run.
+    """
+
+    def __init__(self, lat, lng):
+        """
+        Parameters:
+            lat, lng (array-like): Coordinates in degrees of the indexed points.
+        """
+        self.lat = np.asarray(lat, dtype=float)
+        self.lng = np.asarray(lng, dtype=float)
+        self._tree = None
+
+    @classmethod
+    def from_frame(cls, df):
+        """
+        Index over the lat and lng columns of a DataFrame, or the columns of a (K, 2) array.
+        """
+        if hasattr(df, 'columns'):
+            return cls(df['lat'].to_numpy(), df['lng'].to_numpy())
+        points = np.asarray(df)
+        return cls(points[:, 0], points[:, 1])
+
+    def __len__(self):
+        return len(self.lat)
+
+    @property
+    def tree(self):
+        if self._tree is None:
+            self._tree = BallTree(np.radians(np.column_stack([self.lat, self.lng])), metric='haversine')
+        return self._tree
+
+    def knn(self, lat, lng, k=1):
+        """
+        The k nearest indexed points of every query point.
+        Parameters:
+            lat, lng (array-like): Coordinates in degrees of the query points.
+            k (int): Number of neighbours, at most the number of indexed points.
+        Returns:
+            tuple: (Q, k) distances in km and (Q, k) positions of the neighbours, nearest first.
+        """
+        distances, positions = self.tree.query(_radians(lat, lng), k=min(k, len(self)))
+        return distances * EARTH_RADIUS_KM, positions
+
+    def radius(self, lat, lng, radius_km):
+        """
+        Indexed points within a distance of every query point.
+        Returns:
+            tuple: Object arrays holding, per query point, the distances in km and the positions, nearest first.
+        """
+        positions, distances = self.tree.query_radius(_radians(lat, lng), r=radius_km / EARTH_RADIUS_KM,
+                                                      return_distance=True, sort_results=True)
+        return np.array([d * EARTH_RADIUS_KM for d in distances], dtype=object), positions
+
+    def nearest_with_capacity(self, lat, lng, demand, room, exclude=None):
+        """
+        Nearest indexed point of every query point with room for its demand. Only the nearest
+        neighbours are fetched, more of them for the query points that found no room yet.
+        Parameters:
+            lat, lng (array-like): Coordinates in degrees of the query points.
+            demand (array-like): Demand of every query point.
+            room (ndarray): Available capacity of every indexed point.
+            exclude (array-like): Optional indexed position each query point must not get, e.g. its current one.
+        Returns:
+            ndarray: Position of the nearest point with room, -1 where no point has enough room.
+        """
+        points = _radians(lat, lng)
+        demand = np.asarray(demand, dtype=float)
+        result = np.full(len(points), -1)
+        pending = np.arange(len(points))
+        k = min(INITIAL_NEIGHBOURS, len(self))
+        while pending.size:
+            _, candidates = self.tree.query(points[pending], k=k)
+            fits = (room[candidates] >= demand[pending, None]) & (room[candidates] > 0)
+            if exclude is not None:
+                fits &= candidates != np.asarray(exclude)[pending, None]
+            found = fits.any(axis=1)
+            result[pending[found]] = candidates[found, fits[found].argmax(axis=1)]
+            pending = pending[~found]
+            if k == len(self):
+                break
+            k = min(GROWTH * k, len(self))
+        return result
+
+    def distances(self, positions, lat, lng):
+        """
+        Distances in km from every query point to the indexed point given for it, e.g. its warehouse.
+        """
+        positions = np.asarray(positions)
+        return haversine_array(self.lat[positions], self.lng[positions], lat, lng)
+
+
+def _radians(lat, lng):
+    return np.radians(np.column_stack([np.asarray(lat, dtype=float).ravel(), np.asarray(lng, dtype=float).ravel()]))
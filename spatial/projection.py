@@ -0,0 +1,52 @@
+import numpy as np
+
+# Coordinate spaces the clustering can work in
+PROJECTIONS = ('latlng', 'sphere', 'equal_area')
+
+
+def project(lat, lng, projection='sphere', ref_lat=None):
+    """
+    Projects lat/lng degrees into a space where Euclidean distances follow ground distances better.
+    Parameters:
+        lat, lng (array-like): Coordinates in degrees.
+        projection (str): 'latlng' keeps the degrees, 'sphere' gives 3D points of the unit sphere
+            (chord distance grows with the great-circle distance everywhere, also across the
+            antimeridian), 'equal_area' is the Lambert cylindrical equal-area projection with its
+            standard parallel at `ref_lat`.
+        ref_lat (float): Standard parallel of 'equal_area', the mean latitude by default.
+    Returns:
+        ndarray: (N, 2) or (N, 3) projected points.
+    """
+    lat = np.asarray(lat, dtype=float)
+    lng = np.asarray(lng, dtype=float)
+    if projection == 'latlng':
+        return np.column_stack([lat, lng])
+
+    phi, lam = np.radians(lat), np.radians(lng)
+    if projection == 'sphere':
+        return np.column_stack([np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)])
+    if projection == 'equal_area':
+        cos_ref = np.cos(np.radians(lat.mean() if ref_lat is None else ref_lat))
+        return np.column_stack([lam * cos_ref, np.sin(phi) / cos_ref])
+    raise ValueError(f"Unknown projection '{projection}', expected one of {PROJECTIONS}")
+
+
+def unproject(points, projection='sphere', ref_lat=None):
+    """
+    Inverse of `project`, for instance for cluster centres computed in the projected space.
+    Points inside the unit sphere are pushed back onto its surface.
+    Returns:
+        ndarray: (N, 2) lat/lng degrees.
+    """
+    points = np.asarray(points, dtype=float)
+    if projection == 'latlng':
+        return points[:, :2].copy()
+    if projection == 'sphere':
+        x, y, z = points.T
+        lat = np.arctan2(z, np.hypot(x, y))
+        return np.degrees(np.column_stack([lat, np.arctan2(y, x)]))
+    if projection == 'equal_area':
+        cos_ref = np.cos(np.radians(ref_lat))
+        lat = np.arcsin(np.clip(points[:, 1] * cos_ref, -1, 1))
+        return np.degrees(np.column_stack([lat, points[:, 0] / cos_ref]))
+    raise ValueError(f"Unknown projection '{projection}', expected one of {PROJECTIONS}")
@@ -0,0 +1,17 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+@pytest.fixture
+def customers():
+    """
+    Small synthetic customer set spread over Italy, with integer demand.
+    """
+    rng = np.random.default_rng(0)
+    n = 300
+    return pd.DataFrame({
+        'lat': rng.uniform(37, 46, n),
+        'lng': rng.uniform(8, 17, n),
+        'Demand': rng.integers(1, 50, n).astype(float),
+    })
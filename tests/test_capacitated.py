@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+from metrics.clusters import CAPACITY_MARGIN
+from models import capacitated, kmeans
+
+
+@pytest.mark.parametrize('num_clusters', [3, 6, 10])
+def test_loads_respect_the_capacity(customers, num_clusters):
+    report = {}
+    df, labels, centroids = capacitated.get_capacitated(customers.copy(), num_clusters, report=report)
+    capacity = customers['Demand'].sum() / num_clusters * (1 + CAPACITY_MARGIN)
+    load = np.bincount(labels, weights=customers['Demand'], minlength=num_clusters)
+    assert len(centroids) == num_clusters
+    assert (load <= capacity + 1e-9).all()
+    assert report['over_capacity_clusters'] == 0 and report['max_utilisation'] <= 1
+    np.testing.assert_array_equal(df['Cluster'], labels)
+
+
+def test_same_seed_same_clusters(customers):
+    first = capacitated.get_capacitated(customers.copy(), 5)[1]
+    np.testing.assert_array_equal(first, capacitated.get_capacitated(customers.copy(), 5)[1])
+
+
+def test_warm_start_from_another_number_of_warehouses(customers):
+    previous_solution = kmeans.get_kmeans(customers.copy(), 4)[1:]
+    _, labels, centroids = capacitated.get_capacitated(customers.copy(), 6, previous_solution=previous_solution)
+    assert len(centroids) == 6
+    assert set(np.unique(labels)) <= set(range(6))
@@ -0,0 +1,32 @@
+import numpy as np
+from spatial.distance import cost_matrix, haversine_array, haversine_distance, haversine_matrix, travelling_cost
+
+
+def test_haversine_matrix_matches_the_scalar_distance(customers):
+    warehouses, customers = customers.iloc[:5], customers.iloc[5:60]
+    matrix = haversine_matrix(warehouses['lat'], warehouses['lng'], customers['lat'], customers['lng'])
+    expected = [[haversine_distance(w_lat, w_lng, c_lat, c_lng)
+                 for c_lat, c_lng in zip(customers['lat'], customers['lng'])]
+                for w_lat, w_lng in zip(warehouses['lat'], warehouses['lng'])]
+    np.testing.assert_allclose(matrix, expected, rtol=1e-9, atol=1e-6)
+
+
+def test_single_precision_stays_close(customers):
+    args = customers['lat'][:5], customers['lng'][:5], customers['lat'], customers['lng']
+    matrix32 = haversine_matrix(*args, dtype=np.float32)
+    assert matrix32.dtype == np.float32
+    np.testing.assert_allclose(matrix32, haversine_matrix(*args), rtol=1e-4, atol=0.05)
+
+
+def test_haversine_array_is_the_matrix_diagonal(customers):
+    first, second = customers.iloc[:50], customers.iloc[50:100]
+    matrix = haversine_matrix(first['lat'], first['lng'], second['lat'], second['lng'])
+    np.testing.assert_allclose(haversine_array(first['lat'], first['lng'], second['lat'], second['lng']),
+                               np.diag(matrix), rtol=1e-12)
+
+
+def test_cost_matrix_is_the_travelling_cost_of_the_distances(customers):
+    warehouses = customers.iloc[:4]
+    np.testing.assert_allclose(
+        cost_matrix(warehouses, customers),
+        travelling_cost(haversine_matrix(warehouses['lat'], warehouses['lng'], customers['lat'], customers['lng'])))
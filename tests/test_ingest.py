@@ -0,0 +1,45 @@
+import pandas as pd
+import pytest
+from data_exploration import ingest, loader, normal
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(loader, 'STORE_DIR', str(tmp_path / 'store'))
+    return tmp_path
+
+
+def test_duplicates_merge_across_chunks_and_invalid_rows_are_rejected(store):
+    path = store / 'deliveries.csv'
+    pd.DataFrame({
+        'Latitude': [45.0, 41.9, 45.0, 95.0, 41.9, 40.0, 38.1, 45.0],
+        'Longitude': [9.0, 12.5, 9.0, 10.0, 12.5, 'x', 13.4, 9.0],
+        'Quantity': [2, 3, 5, 1, -1, 1, 0, 0.4],
+    }).to_csv(path, index=False)
+
+    summary = ingest.ingest(str(path), 'deliveries', chunk_size=2)
+    assert summary['rows'] == 8
+    assert summary['rejected'] == {'coordinates': 2, 'demand': 2}
+    assert summary['locations'] == 2
+
+    df = loader.load_dataset('deliveries').sort_values('lat', ignore_index=True)
+    assert df[['lat', 'lng']].values.tolist() == [[41.9, 12.5], [45.0, 9.0]]
+    assert df['Demand'].tolist() == [3, 7.4]
+    assert df['customers'].tolist() == [1, 3]
+
+
+def test_fractional_demand_reaches_the_models(store):
+    path = store / 'tonnes.csv'
+    pd.DataFrame({'lat': [45.0, 41.9], 'lng': [9.0, 12.5], 'demand': [0.4, 0.25]}).to_csv(path, index=False)
+    ingest.ingest(str(path), 'tonnes')
+    df = normal.normal_data(loader.load_dataset('tonnes'), demand_model='column')
+    assert sorted(df['Demand']) == [0.25, 0.4]
+
+
+def test_missing_coordinates_and_bad_names_are_refused(store):
+    path = store / 'deliveries.csv'
+    pd.DataFrame({'city': ['a'], 'demand': [1]}).to_csv(path, index=False)
+    with pytest.raises(ValueError):
+        ingest.ingest(str(path), 'deliveries')
+    with pytest.raises(ValueError):
+        ingest.ingest(str(path), '../deliveries')
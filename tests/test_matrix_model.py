@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+from models import pulp_model
+from models.matrix_model import cardinality_rows, full_arrays, pair_matrix, sparse_arrays
+from spatial.distance import cost_matrix
+
+NUM_OPEN = 3
+
+
+@pytest.fixture
+def instance(customers):
+    customers = customers.iloc[:40]
+    warehouses = customers.iloc[::5]
+    demand = customers['Demand'].to_numpy()
+    supply = np.full(len(warehouses), demand.sum() / NUM_OPEN * 1.1)
+    setup_cost = np.full(len(warehouses), float(pulp_model.SETUP_COST))
+    return cost_matrix(warehouses, customers), demand, supply, setup_cost
+
+
+def nearest(transport_costs, k):
+    return np.argsort(transport_costs, axis=0)[:k].T
+
+
+@pytest.mark.parametrize('backend', ['CBC', 'HiGHS'])
+def test_sparse_on_every_candidate_matches_full_objective(instance, backend):
+    if backend not in pulp_model.available_backends():
+        pytest.skip(f"{backend} is not installed")
+    transport_costs, config = instance[0], {'backend': backend}
+    full = pulp_model.solve_model(full_arrays(*instance, NUM_OPEN), config)
+    sparse = pulp_model.solve_model(
+        sparse_arrays(*instance, nearest(transport_costs, transport_costs.shape[0]), NUM_OPEN), config)
+    assert full['status'] == sparse['status'] == 'Optimal'
+    assert sparse['objective'] == pytest.approx(full['objective'], rel=1e-6)
+
+
+def test_pruned_sparse_objective_is_not_below_full(instance):
+    full = pulp_model.solve_model(full_arrays(*instance, NUM_OPEN))
+    sparse = pulp_model.solve_model(sparse_arrays(*instance, nearest(instance[0], 3), NUM_OPEN))
+    assert sparse['objective'] >= full['objective'] * (1 - 1e-6)
+
+
+@pytest.mark.parametrize('formulation', ['full', 'sparse'])
+def test_solution_opens_num_open_and_serves_every_demand(instance, formulation):
+    transport_costs, demand, supply, _ = instance
+    num_warehouses, num_customers = transport_costs.shape
+    if formulation == 'full':
+        arrays = full_arrays(*instance, NUM_OPEN)
+    else:
+        arrays = sparse_arrays(*instance, nearest(transport_costs, num_warehouses), NUM_OPEN)
+    solution = pulp_model.solve_model(arrays)
+
+    values = solution['values']
+    assert np.round(values[:num_warehouses]).sum() == NUM_OPEN
+    flows = pair_matrix(arrays, values, num_warehouses, num_customers)
+    served = flows.sum(axis=0) if formulation == 'full' else flows.sum(axis=0) * demand
+    np.testing.assert_allclose(served, demand, rtol=1e-6)
+    load = flows.sum(axis=1) if formulation == 'full' else flows @ demand
+    assert (load <= supply * np.round(values[:num_warehouses]) + 1e-6).all()
+
+
+def test_cardinality_row_only_with_more_candidates_than_warehouses(instance):
+    num_warehouses = instance[0].shape[0]
+    assert cardinality_rows(num_warehouses, num_warehouses) == []
+    assert cardinality_rows(num_warehouses, None) == []
+    (rows, cols, coefficients, lower, upper), = cardinality_rows(num_warehouses, NUM_OPEN)
+    assert (cols == np.arange(num_warehouses)).all() and (coefficients == 1).all()
+    assert lower[0] == upper[0] == NUM_OPEN
+
+    full = full_arrays(*instance, NUM_OPEN)
+    assert full['matrix'].shape[0] == 2 * instance[0].shape[1] + num_warehouses + 1
+    assert full_arrays(*instance)['matrix'].shape[0] == full['matrix'].shape[0] - 1
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from metrics.clusters import ClusterMetrics, cluster_metrics, segment_percentile
+from spatial.distance import haversine_array
+
+
+@pytest.mark.parametrize('percentile', [0, 50, 95, 100])
+def test_segment_percentile_matches_numpy(percentile):
+    rng = np.random.default_rng(1)
+    labels = rng.integers(0, 6, 500)
+    labels[labels == 4] = 5  # one empty cluster
+    values = rng.exponential(100, 500)
+    result = segment_percentile(labels, values, 7, percentile)
+    for cluster in range(7):
+        cluster_values = values[labels == cluster]
+        if cluster_values.size:
+            assert result[cluster] == pytest.approx(np.percentile(cluster_values, percentile))
+        else:
+            assert np.isnan(result[cluster])
+
+
+def test_cluster_metrics_match_a_groupby(customers):
+    labels = np.arange(len(customers)) % 4
+    centroids = customers[['lat', 'lng']].to_numpy()[:4]
+    metrics = cluster_metrics(customers, labels, centroids)
+
+    df = customers.assign(label=labels, distance=haversine_array(
+        centroids[labels, 0], centroids[labels, 1], customers['lat'], customers['lng']))
+    groups = df.groupby('label')
+    np.testing.assert_array_equal(metrics.customers, groups.size())
+    np.testing.assert_allclose(metrics.demand, groups['Demand'].sum())
+    np.testing.assert_allclose(metrics.std_demand, groups['Demand'].std(ddof=0))
+    np.testing.assert_allclose(metrics.mean_distance, groups['distance'].mean())
+    np.testing.assert_allclose(metrics.p95_distance, groups['distance'].quantile(0.95))
+    np.testing.assert_allclose(metrics.utilisation * metrics.capacity, metrics.demand)
+
+
+def test_metrics_survive_the_cluster_table(customers):
+    metrics = cluster_metrics(customers, np.arange(len(customers)) % 3, customers[['lat', 'lng']].to_numpy()[:3])
+    restored = ClusterMetrics.from_table(metrics.table())
+    np.testing.assert_allclose(restored.weighted_distance, metrics.weighted_distance)
+    assert restored.capacity == metrics.capacity
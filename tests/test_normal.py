@@ -0,0 +1,42 @@
+import numpy as np
+import pandas as pd
+import pytest
+from data_exploration import normal
+
+
+@pytest.fixture
+def cities():
+    rng = np.random.default_rng(3)
+    n = 200
+    return pd.DataFrame({
+        'city': [f'city{i}' for i in range(n)],
+        'lat': rng.uniform(37, 46, n),
+        'lng': rng.uniform(8, 17, n),
+        'population': rng.integers(1000, 2000000, n).astype(float),
+        'admin_name': rng.choice(['north', 'south'], n),
+    })
+
+
+@pytest.mark.parametrize('demand_model', ['population', 'log'])
+def test_same_seed_same_demand(cities, demand_model):
+    first = normal.normal_data(cities.copy(), seed=7, demand_model=demand_model)
+    second = normal.normal_data(cities.copy(), seed=7, demand_model=demand_model)
+    pd.testing.assert_frame_equal(first, second)
+    assert normal.dataset_hash(first) == normal.dataset_hash(second)
+    assert (first['population'] >= normal.MIN_POPULATION).all()
+
+
+def test_other_seed_other_demand(cities):
+    first = normal.normal_data(cities.copy(), seed=7)
+    second = normal.normal_data(cities.copy(), seed=8)
+    assert not np.array_equal(first['Demand'], second['Demand'])
+    assert normal.dataset_hash(first) != normal.dataset_hash(second)
+
+
+def test_dataset_hash_depends_only_on_the_model_columns(cities):
+    df = normal.normal_data(cities.copy())
+    assert normal.dataset_hash(df) == normal.dataset_hash(df.assign(city='renamed', customer_id=1))
+    assert normal.dataset_hash(df) == normal.dataset_hash(df.set_axis(df.index + 100))
+    moved = df.copy()
+    moved.loc[0, 'lat'] += 1e-6
+    assert normal.dataset_hash(df) != normal.dataset_hash(moved)
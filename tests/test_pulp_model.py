@@ -0,0 +1,76 @@
+import numpy as np
+import pytest
+from models import kmeans, pulp_model
+from models.matrix_model import full_arrays, start_values
+from spatial.distance import cost_matrix
+from spatial.index import SpatialIndex
+
+
+def model_inputs(customers, num_open, num_candidates):
+    candidates = customers.iloc[np.linspace(0, len(customers) - 1, num_candidates).astype(int)]
+    demand = customers['Demand'].to_numpy()
+    supply = np.full(num_candidates, demand.sum() / num_open * 1.1)
+    setup_cost = np.full(num_candidates, float(pulp_model.SETUP_COST))
+    return cost_matrix(candidates, customers), demand, supply, setup_cost, SpatialIndex.from_frame(candidates)
+
+
+@pytest.mark.parametrize('previous_k, num_open', [(4, 6), (6, 6), (8, 6)])
+def test_warm_start_opens_exactly_num_open_sites(customers, previous_k, num_open):
+    transport_costs, demand, supply, setup_cost, index = model_inputs(customers, num_open, 30)
+    _, previous_labels, previous_centroids = kmeans.get_kmeans(customers.copy(), previous_k)
+    lat, lng = customers['lat'].to_numpy(), customers['lng'].to_numpy()
+
+    labels, sites = pulp_model.warm_start_labels(index, (previous_labels, previous_centroids), transport_costs,
+                                                 demand, supply, num_open, lat, lng)
+    assert len(sites) == num_open
+    assert np.isin(labels, sites).all()
+
+    arrays = full_arrays(transport_costs, demand, supply, setup_cost, num_open)
+    start = start_values(arrays, labels, demand, sites)
+    rows = arrays['matrix'] @ start
+    # The last row is the cardinality row, the whole start is feasible
+    assert rows[-1] == num_open
+    assert (rows >= arrays['row_lower'] - 1e-6).all() and (rows <= arrays['row_upper'] + 1e-6).all()
+
+
+def test_select_sites_adds_and_drops_to_num_open(customers):
+    transport_costs, demand, *_ = model_inputs(customers, 5, 20)
+    assert len(pulp_model.select_sites(transport_costs, demand, 5)) == 5
+    assert len(pulp_model.select_sites(transport_costs, demand, 5, np.arange(12))) == 5
+    assert len(pulp_model.select_sites(transport_costs, demand, 5, [3, 3, 7])) == 5
+
+
+def test_repair_capacity_respects_capacity(customers):
+    transport_costs, demand, supply, _, index = model_inputs(customers, 4, 4)
+    lat, lng = customers['lat'].to_numpy(), customers['lng'].to_numpy()
+    # Everyone starts at the first warehouse
+    labels = pulp_model.repair_capacity(np.zeros(len(customers), dtype=int), demand, supply, index, lat, lng)
+    load = np.bincount(labels, weights=demand, minlength=4)
+    assert (load <= supply).all()
+    assert load.sum() == demand.sum()
+
+
+def test_repair_capacity_keeps_feasible_labels(customers):
+    _, demand, supply, _, index = model_inputs(customers, 4, 4)
+    labels = np.arange(len(customers)) % 4
+    lat, lng = customers['lat'].to_numpy(), customers['lng'].to_numpy()
+    np.testing.assert_array_equal(pulp_model.repair_capacity(labels, demand, supply * 2, index, lat, lng), labels)
+
+
+def test_unsolved_model_falls_back_to_num_clusters_sites(customers):
+    report = {}
+    _, labels, centroids = pulp_model.get_pulp(customers.copy(), 6, solver_config={'time_limit': 1e-3},
+                                               report=report)
+    if report['solved']:
+        pytest.skip("The solver found an incumbent within the time limit")
+    assert len(centroids) == report['opened'] == 6
+    assert set(np.unique(labels)) <= set(range(6))
+
+
+@pytest.mark.parametrize('formulation', ['full', 'sparse'])
+def test_customers_without_demand_go_to_an_opened_site(customers, formulation):
+    customers = customers.iloc[:60].copy()
+    customers.loc[customers.index[::3], 'Demand'] = 0
+    _, labels, centroids = pulp_model.get_pulp(customers, 3, formulation=formulation)
+    assert len(centroids) == 3
+    assert ((labels >= 0) & (labels < 3)).all()
@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+from metrics.clusters import CAPACITY_MARGIN
+from models import kmeans
+from models.reduction import REDUCTION_METHODS, SPLIT_SHARE, reduce_customers, reduce_labels, solve_reduced
+
+
+@pytest.mark.parametrize('method', list(REDUCTION_METHODS))
+def test_super_points_carry_the_demand_of_their_customers(customers, method):
+    reduced, assignment = reduce_customers(customers, 50, method)
+    assert len(reduced) <= 50 and len(assignment) == len(customers)
+    demand = customers['Demand'].to_numpy()
+    np.testing.assert_allclose(np.bincount(assignment, weights=demand), reduced['Demand'])
+    np.testing.assert_array_equal(np.bincount(assignment), reduced['customers'])
+
+
+def test_small_customer_sets_are_not_reduced(customers):
+    reduced, assignment = reduce_customers(customers, len(customers))
+    assert reduced is customers
+    np.testing.assert_array_equal(assignment, np.arange(len(customers)))
+
+
+def test_heavy_super_points_are_split(customers):
+    reduced, _ = reduce_customers(customers, 10, max_demand=customers['Demand'].sum() / 40)
+    assert len(reduced) > 10
+    assert reduced['Demand'].max() <= customers['Demand'].sum() / 40 + customers['Demand'].max()
+
+
+def test_labels_project_back_with_unchanged_loads(customers):
+    report = {}
+    df, labels, centroids = solve_reduced(kmeans.get_kmeans, customers.copy(), 4, max_points=50, report=report)
+
+    # Same super-points as `solve_reduced`, solved again by the deterministic K-Means
+    capacity = customers['Demand'].sum() / 4 * (1 + CAPACITY_MARGIN)
+    reduced, assignment = reduce_customers(customers, 50, max_demand=SPLIT_SHARE * capacity)
+    _, point_labels, point_centroids = kmeans.get_kmeans(reduced.copy(), 4)
+
+    assert report['super_points'] == len(reduced)
+    np.testing.assert_array_equal(labels, np.asarray(point_labels)[assignment])
+    np.testing.assert_array_equal(df['Cluster'], labels)
+    np.testing.assert_allclose(centroids, point_centroids)
+    np.testing.assert_allclose(np.bincount(labels, weights=customers['Demand'], minlength=4),
+                               np.bincount(point_labels, weights=reduced['Demand'], minlength=4))
+    assert abs(report['projected_cost'] - report['reduced_cost']) <= report['aggregation_bound'] * (1 + 1e-9)
+
+
+def test_warm_start_is_carried_over_to_the_super_points(customers):
+    seen = {}
+
+    def recording_model(df, num_clusters, previous_solution=None):
+        seen['points'], seen['previous_solution'] = len(df), previous_solution
+        return kmeans.get_kmeans(df, num_clusters)
+
+    _, previous_labels, previous_centroids = kmeans.get_kmeans(customers.copy(), 5)
+    solve_reduced(recording_model, customers.copy(), 4, {'previous_solution': (previous_labels, previous_centroids)},
+                  max_points=50)
+
+    point_labels, centroids = seen['previous_solution']
+    assert len(point_labels) == seen['points'] < len(customers)
+    np.testing.assert_array_equal(centroids, previous_centroids)
+    assert set(np.unique(point_labels)) <= set(np.unique(previous_labels))
+
+
+def test_reduce_labels_picks_the_label_with_most_demand():
+    labels = np.array([0, 1, 1, 2, 2, 0])
+    assignment = np.array([0, 0, 0, 1, 1, 1])
+    demand = np.array([5.0, 2.0, 2.0, 1.0, 1.0, 3.0])
+    np.testing.assert_array_equal(reduce_labels(labels, assignment, demand, 2), [0, 0])
@@ -0,0 +1,66 @@
+import threading
+import numpy as np
+import pandas as pd
+from models.result_cache import ResultCache
+
+
+def test_key_ignores_parameter_order_and_run_only_parameters():
+    key = ResultCache.make_key('abc', 'Pulp', 5, {'formulation': 'sparse', 'k_nearest': 3})
+    assert key == ResultCache.make_key('abc', 'Pulp', 5, {'k_nearest': 3, 'formulation': 'sparse'})
+    assert key == ResultCache.make_key('abc', 'Pulp', np.int64(5), {
+        'k_nearest': 3, 'formulation': 'sparse', 'report': {'status': 'Optimal'}, 'previous_solution': ([0], [[0, 0]])})
+
+
+def test_key_changes_with_the_inputs():
+    key = ResultCache.make_key('abc', 'Pulp', 5, {'formulation': 'sparse'})
+    assert key != ResultCache.make_key('abd', 'Pulp', 5, {'formulation': 'sparse'})
+    assert key != ResultCache.make_key('abc', 'K-Means', 5, {'formulation': 'sparse'})
+    assert key != ResultCache.make_key('abc', 'Pulp', 6, {'formulation': 'sparse'})
+    assert key != ResultCache.make_key('abc', 'Pulp', 5, {'formulation': 'full'})
+    assert key != ResultCache.make_key('abc', 'Pulp', 5, {'formulation': 'sparse', 'reduction': {'max_points': 500}})
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    table = pd.DataFrame({'Cluster': [1, 2], 'Capacities in Units': [10.5, 10.5]}, index=[1, 2])
+    ResultCache(cache_dir=str(tmp_path)).put('key', np.array([0, 1, 1]), np.array([[45.0, 9.0], [41.0, 12.0]]),
+                                             table)
+
+    cache = ResultCache(cache_dir=str(tmp_path))
+    labels, centroids, cluster_table = cache.get('key')
+    np.testing.assert_array_equal(labels, [0, 1, 1])
+    np.testing.assert_array_equal(centroids, [[45.0, 9.0], [41.0, 12.0]])
+    pd.testing.assert_frame_equal(cluster_table, table)
+    assert cache.get('other') is None
+    assert cache.stats()['disk_hits'] == 1 and cache.stats()['misses'] == 1
+
+
+def test_concurrent_puts_and_gets_with_eviction(tmp_path):
+    table = pd.DataFrame({'Cluster': [1], 'Capacities in Units': [1.0]}, index=[1])
+    cache = ResultCache(max_entries=4, cache_dir=str(tmp_path), max_disk_bytes=4000)
+    errors = []
+
+    def worker(offset):
+        try:
+            for i in range(40):
+                key = f'key{(offset + i) % 10}'
+                cache.put(key, np.arange(50), np.zeros((1, 2)), table)
+                cache.get(f'key{(offset + 2 * i) % 10}')
+        except Exception as error:
+            errors.append(error)
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert not errors
+    assert len(cache.entries) <= 4
+    assert not list(tmp_path.glob('*.tmp'))
+
+
+def test_evicted_file_is_a_miss(tmp_path):
+    table = pd.DataFrame({'Cluster': [1], 'Capacities in Units': [1.0]}, index=[1])
+    ResultCache(cache_dir=str(tmp_path)).put('key', np.arange(3), np.zeros((1, 2)), table)
+    cache = ResultCache(cache_dir=str(tmp_path))
+    (tmp_path / 'key.npz').unlink()
+    assert cache.get('key') is None
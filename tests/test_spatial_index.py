@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+from spatial.distance import haversine_matrix
+from spatial.index import SpatialIndex
+
+
+@pytest.fixture
+def index(customers):
+    return SpatialIndex.from_frame(customers.iloc[:40])
+
+
+def brute_force(index, customers):
+    return haversine_matrix(customers['lat'], customers['lng'], index.lat, index.lng)
+
+
+def test_knn_matches_brute_force(index, customers):
+    distances, positions = index.knn(customers['lat'], customers['lng'], 3)
+    expected = np.sort(brute_force(index, customers), axis=1)[:, :3]
+    np.testing.assert_allclose(distances, expected, rtol=1e-9)
+    np.testing.assert_array_equal(positions[:, 0], np.argmin(brute_force(index, customers), axis=1))
+
+
+def test_radius_returns_every_point_within_the_distance_nearest_first(index, customers):
+    distances, positions = index.radius(customers['lat'], customers['lng'], 150)
+    matrix = brute_force(index, customers)
+    for row, (point_distances, point_positions) in enumerate(zip(distances, positions)):
+        np.testing.assert_array_equal(np.sort(point_positions), np.flatnonzero(matrix[row] <= 150))
+        np.testing.assert_allclose(point_distances, matrix[row, point_positions], rtol=1e-9)
+        assert (np.diff(point_distances) >= 0).all()
+
+
+def test_nearest_with_capacity_skips_full_points(index, customers):
+    demand = np.full(len(customers), 5.0)
+    room = np.where(np.arange(len(index)) % 2 == 0, 0.0, 10.0)
+    positions = index.nearest_with_capacity(customers['lat'], customers['lng'], demand, room)
+    matrix = np.where(room >= 5, brute_force(index, customers), np.inf)
+    np.testing.assert_array_equal(positions, np.argmin(matrix, axis=1))
+    assert (index.nearest_with_capacity(customers['lat'], customers['lng'], demand * 3, room) == -1).all()
@@ -2,22 +2,33 @@ import plotly.express as px
 import plotly.subplots as sp
 import streamlit as st
 import plotly.graph_objects as go
+from visualizations.figures import cached_figure
 
 
 def barchart(cluster_table):
+    st.plotly_chart(cached_figure(barchart_figure, cluster_table), use_container_width=True)
+
+
+def demand_capacity_difference_barchart(cluster_table):
+    st.plotly_chart(cached_figure(demand_capacity_difference_figure, cluster_table), use_container_width=True)
+
+
+def barchart_figure(cluster_table):
     fig = px.bar(cluster_table,
                  x='Cluster',
                  y='Average Distance',
                  title='Average Distance per Cluster',
                  hover_data=['Average Distance'],
-                 labels={'Average Distance': 'Average Distance (in units)',
+                 labels={'Average Distance': 'Average Distance (in km)',
                          'Cluster': f'Cluster (Total: {len(cluster_table["Cluster"])} clusters)'}
                  )
 
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
 
-def demand_capacity_difference_barchart(cluster_table):
+def demand_capacity_difference_figure(cluster_table):
+    # Work on a copy, the cluster table is shared by the other charts
+    cluster_table = cluster_table.copy()
     cluster_table['Demand_Capacity_Difference'] = cluster_table['Capacities in Units'] - \
         cluster_table['Total Demand per Cluster in Units']
 
@@ -93,4 +104,4 @@ def demand_capacity_difference_barchart(cluster_table):
         ]
     )
 
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
@@ -0,0 +1,37 @@
+import plotly.graph_objects as go
+import streamlit as st
+
+
+def elbow_chart(sweep_table):
+    fig = go.Figure()
+
+    # Total cost on the left axis
+    fig.add_trace(go.Scatter(
+        x=sweep_table['Warehouses'],
+        y=sweep_table['Total Cost'],
+        mode='lines+markers',
+        name='Total Cost',
+        hovertext=[f"Transport: {t:,.0f}<br>Setup: {s:,.0f}"
+                   for t, s in zip(sweep_table['Transport Cost'], sweep_table['Setup Cost'])],
+        hoverinfo='x+y+text'
+    ))
+
+    # Average distance on the right axis
+    fig.add_trace(go.Scatter(
+        x=sweep_table['Warehouses'],
+        y=sweep_table['Average Distance'],
+        mode='lines+markers',
+        name='Average Distance',
+        yaxis='y2',
+        line=dict(dash='dash')
+    ))
+
+    fig.update_layout(
+        title="Cost and Average Distance per Number of Warehouses",
+        xaxis=dict(title='Number of warehouses', dtick=1),
+        yaxis=dict(title='Total cost'),
+        yaxis2=dict(title='Average distance (km)', overlaying='y', side='right'),
+        autosize=True,
+    )
+
+    st.plotly_chart(fig, use_container_width=True)
@@ -0,0 +1,41 @@
+import plotly.io as pio
+import streamlit as st
+from profiling.trace import count, span
+
+# Figures kept by the cache, shared by every session
+FIGURE_CACHE_ENTRIES = 256
+
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES)
+def _figure_json(_builder, builder_name, *inputs):
+    # Keyed on the builder name and a hash of the inputs, the builder itself is not hashed
+    with span(f'figure.{_builder.__name__}'):
+        return _builder(*inputs).to_json()
+
+
+def cached_figure(builder, *inputs):
+    """
+    Plotly figure built from its inputs, memoized as JSON on a hash of the inputs (e.g. the cluster
+    table), so reruns and other sessions reuse it instead of building it again.
+    Parameters:
+        builder (function): Function returning a plotly figure for the inputs.
+        inputs: DataFrames, arrays or plain values the figure depends on.
+    Returns:
+        go.Figure: The figure.
+    """
+    count('figure.requests')
+    return pio.from_json(_figure_json(builder, f'{builder.__module__}.{builder.__qualname__}', *inputs))
+
+
+@st.cache_data(max_entries=FIGURE_CACHE_ENTRIES)
+def _html(_builder, builder_name, *inputs):
+    with span(f'figure.{_builder.__name__}'):
+        return _builder(*inputs)
+
+
+def cached_html(builder, *inputs):
+    """
+    HTML document built from its inputs, memoized like `cached_figure`, e.g. a rendered folium map.
+    """
+    count('figure.requests')
+    return _html(builder, f'{builder.__module__}.{builder.__qualname__}', *inputs)
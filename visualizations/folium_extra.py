@@ -3,8 +3,11 @@ import branca.colormap as cm
 from branca.element import Template, MacroElement
 import streamlit as st
 from folium.features import DivIcon
-import streamlit_folium as st_folium
+import numpy as np
+import streamlit.components.v1 as components
 from sklearn.preprocessing import MinMaxScaler
+from metrics.clusters import cluster_metrics
+from visualizations.figures import cached_html
 
 col_hex = ['#440154', '#4169E1', '#32CD32', '#FF4500', '#9ACD32', '#4682B4', '#8B0000', '#2E8B57', '#FFD700', '#EE82EE',
            '#FF6347', '#6B8E23', '#FFA500', '#ADFF2F', '#FF1493', '#00BFFF', '#20B2AA', '#7CFC00', '#DB7093', '#00FA9A']
@@ -33,25 +36,29 @@ def number_DivIcon(color, number):
     return icon
 
 
-def folium_extra(df, cluster_labels, centroids):
-    coordinates = df[['lat', 'lng']]
-    df['Cluster'] = cluster_labels
-    lat_mean = df['lat'].mean()
-    lng_mean = df['lng'].mean()
+def folium_extra(df, cluster_labels, centroids, metrics=None):
+    # Total demand per cluster, from the shared cluster metrics
+    if metrics is None:
+        metrics = cluster_metrics(df, cluster_labels, centroids)
+
+    # The map only depends on the centre of the customers, the centroids and their demand
+    html = cached_html(folium_extra_html, df['lat'].mean(), df['lng'].mean(), np.asarray(centroids), metrics.demand)
+    components.html(html, width=1300, height=510)
+
+
+def folium_extra_html(lat_mean, lng_mean, centroids, cluster_demand):
+    """
+    Map of the cluster centroids, circles scaled by the demand of their cluster, rendered to HTML.
+    """
     map = folium.Map(location=[lat_mean, lng_mean], zoom_start=6)
 
-    cluster_demands = df.groupby('Cluster')['Demand'].sum().reset_index()
     scaler = MinMaxScaler(feature_range=(1, 10))
-    scaled_demand = scaler.fit_transform(cluster_demands[['Demand']])
-    scaled_demand = scaled_demand.flatten().tolist()
-    cluster_demands['Scaled_Demand'] = scaled_demand
+    scaled_demand = scaler.fit_transform(cluster_demand.reshape(-1, 1)).ravel()
 
     for idx, centroid in enumerate(centroids):
         lat, long = centroid[:2]
-        demand = cluster_demands.loc[cluster_demands['Cluster']
-                                     == idx, 'Demand'].values[0]
-        scaled_demand_value = cluster_demands.loc[cluster_demands['Cluster']
-                                                  == idx, 'Scaled_Demand'].values[0]
+        demand = cluster_demand[idx]
+        scaled_demand_value = scaled_demand[idx]
 
         folium.Marker(location=[lat, long],
                       icon=folium.Icon(color='white', icon_color='white')).add_to(map)
@@ -69,4 +76,4 @@ def folium_extra(df, cluster_labels, centroids):
             fill_opacity=0.3,
         ).add_to(map)
 
-    st_folium.folium_static(map, width=1300, height=500)
+    return folium.Figure(height=500).add_child(map).render()
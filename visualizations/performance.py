@@ -0,0 +1,35 @@
+import json
+import pandas as pd
+import streamlit as st
+from profiling.trace import Trace
+
+
+def performance_panel(page_trace, model_trace=None):
+    """
+    Collapsible panel with the stage timings and counters of the last model run and of the
+    current page render, the Chrome trace download and the cProfile dump of the profiled stage.
+    Parameters:
+        page_trace (Trace): Trace of the current rerun of the page.
+        model_trace (Trace): Trace of the model job behind the displayed results, None when the
+            results came from the cache or nothing was run.
+    """
+    with st.expander("Performance"):
+        sections = [("Last model run", model_trace), ("This page render", page_trace)]
+        for title, trace in sections:
+            if trace is None:
+                continue
+            st.markdown(f"**{title}**")
+            st.dataframe(trace.table().round(2), use_container_width=True, hide_index=True)
+            if trace.counters:
+                st.dataframe(pd.DataFrame(trace.counters.items(), columns=['Counter', 'Value']),
+                             use_container_width=True, hide_index=True)
+
+        combined = Trace().merge(model_trace).merge(page_trace)
+        st.download_button("Download Chrome trace", json.dumps(combined.chrome_trace(), default=str),
+                           file_name='trace.json', mime='application/json',
+                           help="Open in chrome://tracing or ui.perfetto.dev")
+        for name, dump in combined.profiles.items():
+            st.markdown(f"**cProfile of `{name}`**")
+            st.code(dump['text'])
+            st.download_button(f"Download {name}.prof", dump['prof'], file_name=f'{name}.prof',
+                               help="Statistics for pstats or snakeviz")
@@ -1,8 +1,17 @@
 import plotly.express as px
 import streamlit as st
+from visualizations.figures import cached_figure
 
 
 def piechart(cluster_table):
+    st.plotly_chart(cached_figure(piechart_figure, cluster_table), use_container_width=True)
+
+
+def piechart_cluster_count(cluster_table):
+    st.plotly_chart(cached_figure(piechart_cluster_count_figure, cluster_table), use_container_width=True)
+
+
+def piechart_figure(cluster_table):
     cluster_demand_distribution = cluster_table['Total Demand per Cluster in Units']
 
     fig = px.pie(cluster_demand_distribution,
@@ -17,10 +26,10 @@ def piechart(cluster_table):
     fig.update_traces(textinfo='percent+label+value',  # Show percent, label and value
                       hovertemplate="%{label}: %{value} <br>Demand: %{customdata[0]}")
 
-    st.plotly_chart(fig, use_container_width=True)
+    return fig
 
 
-def piechart_cluster_count(cluster_table):
+def piechart_cluster_count_figure(cluster_table):
     # Group the data by 'Cluster' and count the number of data points in each cluster
     cluster_count_distribution = cluster_table['Customers per cluster']
 
@@ -35,4 +44,4 @@ def piechart_cluster_count(cluster_table):
     fig.update_traces(textinfo='percent+label+value',  # Show percent, label and value
                       hovertemplate="%{label}: %{value} <br>Count: %{customdata[0]}")
 
-    st.plotly_chart(fig, use_container_width=True)
+    return fig